@@ -0,0 +1,282 @@
+"""
+Benchmark de los motores del servidor de chat de cliente.py (selectors y asyncio).
+
+Para cada motor y cantidad de clientes levanta el servidor en un proceso aparte, conecta
+los clientes desde un loop asyncio y mide:
+- clientes que lograron conectarse,
+- tiempo hasta que todos recibieron todo lo que mandaron los emisores,
+- mensajes entregados por segundo (un mensaje enviado a N-1 clientes cuenta N-1 veces)
+  y MB/s de carga útil entregada.
+
+Antes de cronometrar, un mensaje de sincronización (reenviado hasta que llega a todos)
+confirma que el servidor ya registró a todos los clientes. Los mensajes van con el mismo
+enmarcado que el servidor (--framing) y los receptores cuentan mensajes completos,
+separando los de sincronización de la carga útil.
+
+Uso:
+    python benchmark_chat.py --clientes 50 200 500 --salida chat.json
+    python benchmark_chat.py --clientes 50 200 500 --base chat.json
+    python benchmark_chat.py --clientes 1000 --motores selectors --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+from cliente import LENGTH_HEADER
+
+# ---------------------------
+# CONFIGURACIÓN
+# ---------------------------
+MOTORES = ('selectors', 'asyncio')
+CLIENTES = (50, 200, 500)
+CONEXIONES_POR_TANDA = 100  # conexiones abiertas a la vez, para no llenar el backlog
+ESPERA_SERVIDOR = 10.0      # segundos para que el servidor empiece a aceptar
+ENMARCADOS = ('line', 'length')
+REINTENTO_SINCRONIZACION = 0.1  # segundos entre reenvíos del mensaje de sincronización
+SINCRONIZACION = b'!'           # contenido del mensaje de sincronización; la carga útil es b'x' * tamano
+SERVIDOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cliente.py')
+
+
+# ---------------------------
+# SERVIDOR
+# ---------------------------
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def levantar_servidor(motor, puerto, enmarcado, workers=1):
+    proceso = subprocess.Popen(
+        [sys.executable, SERVIDOR, '--engine', motor, '--framing', enmarcado, '--workers', str(workers),
+         '--host', '127.0.0.1', '--port', str(puerto)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + ESPERA_SERVIDOR
+    while time.monotonic() < limite:
+        try:
+            socket.create_connection(('127.0.0.1', puerto), timeout=0.5).close()
+            return proceso
+        except OSError:
+            time.sleep(0.05)
+    proceso.kill()
+    raise RuntimeError(f"El servidor {motor} no empezó a escuchar en el puerto {puerto}")
+
+
+# ---------------------------
+# CLIENTES
+# ---------------------------
+def enmarcar(enmarcado, carga):
+    if enmarcado == 'line':
+        return carga + b'\n'
+    return LENGTH_HEADER.pack(len(carga)) + carga
+
+
+class _Receptor(asyncio.Protocol):
+    # Cuenta los mensajes completos recibidos y avisa cuando llegan a lo esperado. Los de
+    # sincronización se cuentan aparte: un reenvío que llega tarde no pasa por carga útil.
+    def __init__(self, enmarcado):
+        self.enmarcado = enmarcado
+        self.pendiente = bytearray()
+        self.recibidos = 0         # sólo carga útil
+        self.sincronizaciones = 0
+        self.ultimo = b''          # último byte leído, por si el fin de una sincronización quedó partido
+        self.esperado = None
+        self.listo = asyncio.Event()
+        self.sincronizado = asyncio.Event()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, datos):
+        if self.enmarcado == 'line':
+            # Cada línea llega como "[ip:puerto] contenido\n"
+            sincronizaciones = datos.count(SINCRONIZACION + b'\n')
+            if self.ultimo == SINCRONIZACION and datos[:1] == b'\n':
+                sincronizaciones += 1
+            self.ultimo = datos[-1:]
+            self.sincronizaciones += sincronizaciones
+            self.recibidos += datos.count(b'\n') - sincronizaciones
+        else:
+            self.pendiente += datos
+            inicio, cabecera = 0, LENGTH_HEADER.size
+            while len(self.pendiente) - inicio >= cabecera:
+                (largo,) = LENGTH_HEADER.unpack_from(self.pendiente, inicio)
+                if len(self.pendiente) - inicio - cabecera < largo:
+                    break
+                inicio += cabecera + largo
+                if self.pendiente[inicio-1:inicio] == SINCRONIZACION:
+                    self.sincronizaciones += 1
+                else:
+                    self.recibidos += 1
+            del self.pendiente[:inicio]
+        if self.sincronizaciones:
+            self.sincronizado.set()
+        if self.esperado is not None and self.recibidos >= self.esperado:
+            self.listo.set()
+
+
+async def _conectar(puerto, cantidad, enmarcado):
+    loop = asyncio.get_running_loop()
+    clientes = []
+    for inicio in range(0, cantidad, CONEXIONES_POR_TANDA):
+        tanda = [loop.create_connection(lambda: _Receptor(enmarcado), '127.0.0.1', puerto)
+                 for _ in range(min(CONEXIONES_POR_TANDA, cantidad - inicio))]
+        for resultado in await asyncio.gather(*tanda, return_exceptions=True):
+            if not isinstance(resultado, BaseException):
+                clientes.append(resultado[1])
+    return clientes
+
+
+async def _emitir(cliente, mensaje, cantidad):
+    for i in range(cantidad):
+        cliente.transport.write(mensaje)
+        if i % 64 == 63:
+            await asyncio.sleep(0)
+
+
+async def _sincronizar(conectados, enmarcado, limite):
+    # create_connection vuelve cuando el kernel aceptó la conexión, que puede ser antes de
+    # que el servidor registre al cliente en la sala: reenviar hasta que todos lo reciban
+    mensaje = enmarcar(enmarcado, SINCRONIZACION)
+    esperas = [asyncio.ensure_future(c.sincronizado.wait()) for c in conectados[1:]]
+    fin = time.monotonic() + limite
+    try:
+        while True:
+            conectados[0].transport.write(mensaje)
+            _, pendientes = await asyncio.wait(esperas, timeout=REINTENTO_SINCRONIZACION)
+            if not pendientes:
+                break
+            if time.monotonic() > fin:
+                raise asyncio.TimeoutError
+    finally:
+        for espera in esperas:
+            espera.cancel()
+
+
+async def _correr(puerto, clientes, emisores, mensajes, tamano, limite, enmarcado):
+    conectados = await _conectar(puerto, clientes, enmarcado)
+    try:
+        if len(conectados) < 2:
+            return len(conectados), None
+        # Un mensaje de sincronización: cuando todos lo reciben, el servidor ya los registró
+        await _sincronizar(conectados, enmarcado, limite)
+
+        emisores = min(emisores, len(conectados))
+        for i, cliente in enumerate(conectados):
+            cliente.esperado = mensajes * (emisores - (i < emisores))
+            if cliente.esperado == 0:
+                cliente.listo.set()
+        mensaje = enmarcar(enmarcado, b'x' * tamano)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(_emitir(c, mensaje, mensajes) for c in conectados[:emisores]))
+        await asyncio.wait_for(asyncio.gather(*(c.listo.wait() for c in conectados)), limite)
+        return len(conectados), time.perf_counter() - t0
+    except asyncio.TimeoutError:
+        return len(conectados), None
+    finally:
+        for cliente in conectados:
+            cliente.transport.close()
+
+
+def medir(motor, clientes, emisores, mensajes, tamano, limite, enmarcado='line', workers=1):
+    puerto = _puerto_libre()
+    servidor = levantar_servidor(motor, puerto, enmarcado, workers)
+    try:
+        conectados, tiempo = asyncio.run(_correr(puerto, clientes, emisores, mensajes, tamano, limite, enmarcado))
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    fila = {'motor': motor, 'enmarcado': enmarcado, 'workers': workers, 'clientes': clientes, 'conectados': conectados,
+            'emisores': emisores, 'mensajes': mensajes, 'tamano_mensaje': tamano, 'tiempo_s': tiempo}
+    if tiempo is not None:
+        entregas = min(emisores, conectados) * mensajes * (conectados - 1)
+        fila['mensajes_por_s'] = entregas / tiempo
+        fila['mb_por_s'] = entregas * tamano / tiempo / 1e6
+    return fila
+
+
+# ---------------------------
+# INFORME Y COMPARACIÓN
+# ---------------------------
+def _clave(fila):
+    return (fila['motor'], fila.get('enmarcado', 'line'), fila.get('workers', 1), fila['clientes'], fila['emisores'], fila['mensajes'],
+            fila['tamano_mensaje'])
+
+
+def _formatear(fila, base=None):
+    texto = f"{fila['motor']:10} {fila.get('enmarcado', 'line'):6} x{fila.get('workers', 1):<2} {fila['clientes']:>6} clientes {fila['conectados']:>6} conectados "
+    if fila['tiempo_s'] is None:
+        return texto + "   sin completar (tiempo límite o menos de 2 clientes)"
+    texto += f"{fila['tiempo_s']:8.3f} s {fila['mensajes_por_s']:>12.0f} msg/s {fila['mb_por_s']:8.2f} MB/s"
+    if base is not None and base.get('mensajes_por_s'):
+        texto += f"  x{fila['mensajes_por_s'] / base['mensajes_por_s']:.2f} msg/s"
+    return texto
+
+
+def comparar(resultados, base, mostrar=print):
+    previos = {_clave(fila): fila for fila in base['resultados']}
+    for fila in resultados:
+        anterior = previos.get(_clave(fila))
+        if anterior is not None:
+            mostrar(_formatear(fila, anterior))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los motores del servidor de chat")
+    parser.add_argument('--motores', nargs='+', choices=MOTORES, default=list(MOTORES))
+    parser.add_argument('--enmarcados', nargs='+', choices=ENMARCADOS, default=['line'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1],
+                        help="procesos del servidor (más de 1 sólo con el motor selectors)")
+    parser.add_argument('--clientes', type=int, nargs='+', default=list(CLIENTES))
+    parser.add_argument('--emisores', type=int, default=5, help="clientes que envían")
+    parser.add_argument('--mensajes', type=int, default=1000, help="mensajes por emisor")
+    parser.add_argument('--tamano', type=int, default=100, help="bytes por mensaje")
+    parser.add_argument('--limite', type=float, default=60.0, help="segundos máximos por corrida")
+    parser.add_argument('--salida', help="archivo JSON donde guardar los resultados")
+    parser.add_argument('--base', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    resultados = []
+    for clientes in args.clientes:
+        for enmarcado in args.enmarcados:
+            for workers in args.workers:
+                for motor in args.motores:
+                    if workers > 1 and motor != 'selectors':
+                        continue
+                    fila = medir(motor, clientes, args.emisores, args.mensajes, args.tamano, args.limite,
+                                 enmarcado, workers)
+                    resultados.append(fila)
+                    print(_formatear(fila))
+    informe = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': vars(args),
+        },
+        'resultados': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print("Resultados guardados en", args.salida)
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        print("\nComparación con", args.base)
+        comparar(resultados, base)
+    return informe
+
+
+if __name__ == "__main__":
+    main()
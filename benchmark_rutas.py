@@ -0,0 +1,283 @@
+"""
+Benchmark reproducible de los motores de rutas de calculadora.py y calculadora2.py.
+
+Para cada tamaño de mapa y densidad de obstáculos genera un mapa con semilla fija, elige
+pares de extremos de cada tipo de consulta y mide:
+- tiempo por consulta (media y mínimo de varias repeticiones),
+- nodos expandidos (celdas sacadas de la cola o del heap),
+- memoria pico reservada durante la consulta (tracemalloc).
+
+Los nodos y la memoria se miden en una pasada aparte, fuera de los tiempos, porque el
+conteo y tracemalloc frenan la búsqueda.
+
+Tipos de consulta:
+- tierra:              BFS sólo por tierra entre celdas conectadas por tierra
+- tierra_inalcanzable: BFS sólo por tierra entre celdas de regiones distintas
+- agua:                encontrar_mejor_ruta entre celdas que sólo se unen cruzando agua
+- agua_inalcanzable:   encontrar_mejor_ruta entre celdas sin conexión ni por agua
+
+Uso:
+    python benchmark_rutas.py --tamanos 10 100 500 --salida resultados.json
+    python benchmark_rutas.py --tamanos 10 100 500 --base resultados.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import calculadora
+from calculadora2 import CAMINO_LIBRE, Mapa, CalculadoraDeRutas
+
+# ---------------------------
+# CONFIGURACIÓN
+# ---------------------------
+TAMANOS = (10, 100, 500, 1000, 2000, 5000)
+
+# Nombre -> (prob_edificio, prob_agua, prob_bloqueo); 'normal' son los valores por
+# defecto de generar_obstaculos_aleatorios
+DENSIDADES = {
+    'baja': (0.075, 0.05, 0.025),
+    'normal': (0.15, 0.10, 0.05),
+    'alta': (0.225, 0.15, 0.075),
+}
+
+TIPOS_CONSULTA = ('tierra', 'tierra_inalcanzable', 'agua', 'agua_inalcanzable')
+
+INTENTOS_POR_PAR = 200  # celdas al azar que se prueban antes de dar un tipo por imposible
+
+
+# ---------------------------
+# MOTORES
+# ---------------------------
+# Cada motor recibe el mapa ya preparado y devuelve una función (inicio, destino, tipo).
+def _motor_calculadora(mapa):
+    matriz = [list(fila) for fila in mapa.matriz]
+    celdas = calculadora.aplanar_mapa(matriz)  # una vez por mapa, no en cada consulta
+
+    def consultar(inicio, destino, tipo):
+        if tipo.startswith('tierra'):
+            return calculadora.busqueda_por_anchura(matriz, inicio, destino, celdas=celdas)
+        return calculadora.encontrar_mejor_ruta(matriz, inicio, destino, celdas=celdas)
+    return consultar
+
+
+def _motor_calculadora2(modo, usar_componentes):
+    def preparar(mapa):
+        rutas = CalculadoraDeRutas(mapa, modo, tam_cache=0, usar_componentes=usar_componentes)
+
+        def consultar(inicio, destino, tipo):
+            if tipo.startswith('tierra'):
+                # buscar no mira el índice de componentes: con él, un par de regiones
+                # distintas se descarta antes de buscar, como en encontrar_mejor_ruta
+                if usar_componentes and not mapa.mismo_componente(inicio, destino):
+                    return None
+                return rutas.buscar(inicio, destino)
+            return rutas.encontrar_mejor_ruta(inicio, destino)
+        return consultar
+    return preparar
+
+
+MOTORES = {
+    'calculadora.busqueda_por_anchura': _motor_calculadora,
+    'CalculadoraDeRutas.bfs': _motor_calculadora2('bfs', usar_componentes=False),
+    'CalculadoraDeRutas.bfs+componentes': _motor_calculadora2('bfs', usar_componentes=True),
+}
+
+
+# ---------------------------
+# MAPAS Y PARES DE EXTREMOS
+# ---------------------------
+def generar_mapa(tamano, densidad, semilla):
+    random.seed(f"{semilla}-{tamano}-{densidad}")
+    mapa = Mapa(tamano, tamano)
+    mapa.generar_obstaculos_aleatorios(*DENSIDADES[densidad])
+    return mapa
+
+
+def _cumple(mapa, a, b, tipo):
+    misma_tierra = mapa.mismo_componente(a, b)
+    misma_agua = mapa.mismo_componente(a, b, permitir_agua=True)
+    if tipo == 'tierra':
+        return misma_tierra
+    if tipo == 'tierra_inalcanzable':
+        return not misma_tierra
+    if tipo == 'agua':
+        return misma_agua and not misma_tierra
+    return not misma_agua
+
+
+def elegir_pares(mapa, tipo, cantidad, semilla):
+    # Pares de celdas de camino libre que cumplen el tipo; pueden ser menos de `cantidad`
+    # (o ninguno) si el mapa no tiene regiones de esa clase.
+    azar = random.Random(f"{semilla}-{mapa.filas}-{tipo}")
+    libres = [i for i, valor in enumerate(mapa.celdas) if valor == CAMINO_LIBRE] if mapa.filas <= 1000 else None
+
+    def celda_libre():
+        if libres is not None:
+            indice = azar.choice(libres) if libres else None
+        else:
+            for _ in range(INTENTOS_POR_PAR):
+                indice = azar.randrange(len(mapa.celdas))
+                if mapa.celdas[indice] == CAMINO_LIBRE:
+                    break
+            else:
+                indice = None
+        return None if indice is None else divmod(indice, mapa.columnas)
+
+    pares = []
+    for _ in range(cantidad * INTENTOS_POR_PAR):
+        if len(pares) == cantidad:
+            break
+        a, b = celda_libre(), celda_libre()
+        if a is None:
+            break
+        if a != b and _cumple(mapa, a, b, tipo):
+            pares.append((a, b))
+    return pares
+
+
+# ---------------------------
+# MEDICIÓN
+# ---------------------------
+_EXPANSIONES = ('popleft', 'heappop')
+
+
+def _contar_expansiones(funcion, *argumentos):
+    # Cuenta las llamadas a deque.popleft y heapq.heappop mientras corre la consulta: cada
+    # una saca un nodo de la frontera para expandirlo.
+    total = 0
+
+    def perfil(_marco, evento, arg):
+        nonlocal total
+        if evento == 'c_call' and getattr(arg, '__name__', None) in _EXPANSIONES:
+            total += 1
+
+    sys.setprofile(perfil)
+    try:
+        funcion(*argumentos)
+    finally:
+        sys.setprofile(None)
+    return total
+
+
+def _memoria_pico(funcion, *argumentos):
+    tracemalloc.start()
+    try:
+        funcion(*argumentos)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico
+
+
+def medir(consultar, pares, tipo, repeticiones):
+    tiempos, nodos, memoria = [], [], []
+    for inicio, destino in pares:
+        mejor = None
+        total = 0.0
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            consultar(inicio, destino, tipo)
+            transcurrido = time.perf_counter() - t0
+            total += transcurrido
+            mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+        tiempos.append((total / repeticiones, mejor))
+        nodos.append(_contar_expansiones(consultar, inicio, destino, tipo))
+        memoria.append(_memoria_pico(consultar, inicio, destino, tipo))
+    n = len(pares)
+    return {
+        'consultas': n,
+        'tiempo_medio_s': sum(t for t, _ in tiempos) / n,
+        'tiempo_min_s': min(m for _, m in tiempos),
+        'nodos_expandidos_medio': sum(nodos) / n,
+        'memoria_pico_bytes': max(memoria),
+    }
+
+
+def ejecutar(tamanos, densidades, motores, tipos, consultas, repeticiones, semilla, mostrar=print):
+    resultados = []
+    for tamano in tamanos:
+        for densidad in densidades:
+            mapa = generar_mapa(tamano, densidad, semilla)
+            pares_por_tipo = {tipo: elegir_pares(mapa, tipo, consultas, semilla) for tipo in tipos}
+            for nombre in motores:
+                consultar = MOTORES[nombre](mapa)
+                for tipo, pares in pares_por_tipo.items():
+                    if not pares:
+                        mostrar(f"{tamano}x{tamano} {densidad:6} {tipo:20} sin pares de este tipo")
+                        continue
+                    fila = {'motor': nombre, 'tamano': tamano, 'densidad': densidad, 'consulta': tipo}
+                    fila.update(medir(consultar, pares, tipo, repeticiones))
+                    resultados.append(fila)
+                    mostrar(_formatear(fila))
+    return resultados
+
+
+# ---------------------------
+# INFORME Y COMPARACIÓN
+# ---------------------------
+def _clave(fila):
+    return (fila['motor'], fila['tamano'], fila['densidad'], fila['consulta'])
+
+
+def _formatear(fila, base=None):
+    texto = (f"{fila['motor']:36} {fila['tamano']:>5}x{fila['tamano']:<5} {fila['densidad']:6} "
+             f"{fila['consulta']:20} {fila['tiempo_medio_s'] * 1000:10.3f} ms "
+             f"{fila['nodos_expandidos_medio']:>12.0f} nodos {fila['memoria_pico_bytes'] / 1024:>10.0f} KiB")
+    if base is not None:
+        texto += f"  x{fila['tiempo_medio_s'] / base['tiempo_medio_s']:.2f} tiempo"
+    return texto
+
+
+def comparar(resultados, base, mostrar=print):
+    # Razón tiempo actual / tiempo base para cada caso presente en ambas corridas
+    previos = {_clave(fila): fila for fila in base['resultados']}
+    for fila in resultados:
+        anterior = previos.get(_clave(fila))
+        if anterior is not None:
+            mostrar(_formatear(fila, anterior))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de rutas")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=list(TAMANOS))
+    parser.add_argument('--densidades', nargs='+', choices=list(DENSIDADES), default=list(DENSIDADES))
+    parser.add_argument('--motores', nargs='+', choices=list(MOTORES), default=list(MOTORES))
+    parser.add_argument('--tipos', nargs='+', choices=TIPOS_CONSULTA, default=list(TIPOS_CONSULTA))
+    parser.add_argument('--consultas', type=int, default=5, help="pares por tipo de consulta")
+    parser.add_argument('--repeticiones', type=int, default=3, help="repeticiones cronometradas por par")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--salida', help="archivo JSON donde guardar los resultados")
+    parser.add_argument('--base', help="JSON de una corrida anterior para comparar")
+    args = parser.parse_args(argv)
+
+    resultados = ejecutar(args.tamanos, args.densidades, args.motores, args.tipos,
+                          args.consultas, args.repeticiones, args.semilla)
+    informe = {
+        'meta': {
+            'fecha': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': vars(args),
+        },
+        'resultados': resultados,
+    }
+    if args.salida:
+        with open(args.salida, 'w') as f:
+            json.dump(informe, f, indent=2)
+        print("Resultados guardados en", args.salida)
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        print("\nComparación con", args.base)
+        comparar(resultados, base)
+    return informe
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,15 @@
 # Importo librerias
 from collections import deque
+import heapq
+from itertools import chain
+import json
 import random
+import sys
+
+from instrumentacion import medir_consulta
+from lector_mapas import leer_mapa_texto
+from nucleo_bfs import nucleo_para
+import renderizado
 
 # Constantes del terreno
 CAMINO_LIBRE = 0
@@ -8,6 +17,17 @@ EDIFICIO = 1
 AGUA = 2
 ZONA_BLOQUEADA = 3
 
+def tabla_transitable(permitir_agua):
+    "Para cada valor de celda (0 a 255) dice si se puede pasar: todo menos edificios, zonas bloqueadas y, si no se permite, agua"
+
+    tabla = bytearray([1]) * 256
+    tabla[EDIFICIO] = tabla[ZONA_BLOQUEADA] = 0
+    if not permitir_agua:
+        tabla[AGUA] = 0
+    return bytes(tabla)
+
+_TRANSITABLE = {False: tabla_transitable(False), True: tabla_transitable(True)}
+
 # Funciones del mapa
 def crear_mapa_vacio(cantidad_filas, cantidad_columnas, valor_relleno=CAMINO_LIBRE):
     "Crea y devuelve una matriz de tamaño filas x columnas con un valor inicial"
@@ -50,36 +70,11 @@ def redimensionar_mapa(mapa, nuevas_filas, nuevas_columnas, valor_relleno=CAMINO
 def cargar_mapa_desde_archivo(ruta_archivo):
     "Carga un mapa desde un archivo de texto"
 
-    mapa = []
-    with open(ruta_archivo, 'r', encoding='utf-8') as archivo:
-        for linea in archivo:
-            linea = linea.strip()
-            "Quita los espacios o saltos de línea al principio y al final de la línea"
-
-            if not linea or linea.startswith('#'):
-                "Si la línea está vacía o empieza con “#” se salta"
-
-                continue
-            linea = linea.replace(',', ' ')
-            "reemplaza las , por espacios"
-
-            fila = [int(valor) for valor in linea.split()]
-            "Divide la línea en partes usando los espacios y convierte cada parte en número entero"
-
-            mapa.append(fila)
-            "Agrega esa fila a la lista principal del mapa"
-
-    if not mapa:
-        raise ValueError("El archivo de mapa está vacío o no contiene filas válidas")
-    "Si no se leyó nada, el programa lanza un error con este mensaje"
-
-    cantidad_columnas = len(mapa[0])
-    for fila in mapa:
-        if len(fila) != cantidad_columnas:
-            raise ValueError("Las filas del mapa tienen diferente número de columnas")
-        "Verifica que todas las filas tengan el mismo tamaño"
+    cantidad_filas, cantidad_columnas, celdas = leer_mapa_texto(ruta_archivo)
+    "lector_mapas se encarga de saltar comentarios, aceptar comas y validar que todas las filas midan lo mismo"
 
-    return mapa
+    return [list(celdas[indice_fila * cantidad_columnas:(indice_fila + 1) * cantidad_columnas]) for indice_fila in range(cantidad_filas)]
+    "corta las celdas en filas y convierte cada fila en una lista de enteros"
 
 def guardar_mapa_en_archivo(mapa, ruta_archivo):
     "Guarda el mapa actual en un archivo"
@@ -94,38 +89,20 @@ def guardar_mapa_en_archivo(mapa, ruta_archivo):
             "Escribe la fila en el archivo y salta de línea"
 
 # Visualisacion del mapa
-def imprimir_mapa(mapa, ruta_camino=None, posicion_inicio=None, posicion_destino=None, modo_detallado=False):
+def imprimir_mapa(mapa, ruta_camino=None, posicion_inicio=None, posicion_destino=None, modo_detallado=False, ventana=None):
     "Imprime el mapa con símbolos más legibles."
 
     cantidad_filas = len(mapa)
-    cantidad_columnas = len(mapa[0])
-    conjunto_ruta = set(ruta_camino) if ruta_camino else set()
-
-    for indice_fila in range(cantidad_filas):
-        linea = []
-        for indice_columna in range(cantidad_columnas):
-            coordenada_actual = (indice_fila, indice_columna)
-            if coordenada_actual == posicion_inicio:
-                simbolo = 'I'
-            elif coordenada_actual == posicion_destino:
-                simbolo = 'D'
-            elif coordenada_actual in conjunto_ruta:
-                simbolo = '*'
-            else:
-                valor = mapa[indice_fila][indice_columna]
-                if valor == CAMINO_LIBRE:
-                    simbolo = '.'
-                elif valor == EDIFICIO:
-                    simbolo = 'X'
-                elif valor == AGUA:
-                    simbolo = '~' if modo_detallado else 'X'
-                elif valor == ZONA_BLOQUEADA:
-                    simbolo = 'T' if modo_detallado else 'X'
-                else:
-                    simbolo = '?'
-            linea.append(simbolo)
-        print(' '.join(linea))
-    print()
+    cantidad_columnas = len(mapa[0]) if mapa else 0
+    renderizado.mostrar(lambda fila, desde, hasta: mapa[fila][desde:hasta], cantidad_filas, cantidad_columnas,
+                        ruta_camino, posicion_inicio, posicion_destino, modo_detallado, ventana)
+    "renderizado.py arma todo el cuadro con una tabla de simbolos y lo escribe de una vez; ventana limita la parte que se dibuja"
+
+def aplanar_mapa(mapa):
+    "Copia el mapa a un solo bloque de bytes: la celda (fila, columna) queda en fila*columnas + columna"
+
+    return bytes(chain.from_iterable(mapa))
+    "cuesta recorrer todo el mapa: quien hace muchas busquedas sobre el mismo mapa lo aplana una vez y pasa celdas"
 
 # Validaciones
 def esta_dentro_de_limites(mapa, coordenada):
@@ -142,9 +119,16 @@ def es_celda_transitable(mapa, coordenada, permitir_agua=False):
     return False
 
 # Algoritmo de busqueda bfs
-def busqueda_por_anchura(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False):
+def busqueda_por_anchura(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False, instrumentacion=None, crear_cola=deque, celdas=None):
     "Busca una ruta entre inicio y destino usando el algoritmo BFS (anchura)."
 
+    if instrumentacion is not None:
+        datos = {'operacion': 'buscar', 'modo': 'anchura', 'inicio': coordenada_inicio,
+                 'destino': coordenada_destino, 'paso_agua': permitir_agua}
+        return medir_consulta(instrumentacion, datos, lambda medicion: busqueda_por_anchura(
+            mapa, coordenada_inicio, coordenada_destino, permitir_agua, crear_cola=medicion.cola, celdas=celdas))
+    "con un sumidero de instrumentacion.py se mide la busqueda; crear_cola es la cola que cuenta las celdas expandidas"
+
     if not (esta_dentro_de_limites(mapa, coordenada_inicio) and esta_dentro_de_limites(mapa, coordenada_destino)):
         return None
     "verifica que inicio y destino este dentro de los limites"
@@ -160,78 +144,188 @@ def busqueda_por_anchura(mapa, coordenada_inicio, coordenada_destino, permitir_a
     total_filas, total_columnas = len(mapa), len(mapa[0])
     "guarda cuantas filas y columnas tiene el mapa"
 
-    visitado = [[False] * total_columnas for _ in range(total_filas)]
-    "guarda qué celdas ya fueron visitadas (evita repetir)"
+    if celdas is None:
+        celdas = aplanar_mapa(mapa)
+    "el mapa aplanado (ver aplanar_mapa); si quien llama ya lo tiene, no se vuelve a copiar"
 
-    previo = [[None] * total_columnas for _ in range(total_filas)]
-    "guarda de dónde venimos al llegar a una celda, para poder reconstruir el camino al final"
+    nucleo = nucleo_para(total_filas, total_columnas)
+    "nucleo_bfs.py guarda visitado y previo en arrays que se reutilizan entre busquedas del mismo tamaño"
 
-    cola = deque([coordenada_inicio])
-    "crea una cola de dos extremos"
+    return nucleo.buscar(celdas, _TRANSITABLE[permitir_agua],
+                         coordenada_inicio[0] * total_columnas + coordenada_inicio[1],
+                         coordenada_destino[0] * total_columnas + coordenada_destino[1], crear_cola)
+    "recorre la cola con indices enteros y solo arma las tuplas (fila, columna) de la ruta final, o devuelve None si no hay ruta"
 
-    visitado[coordenada_inicio[0]][coordenada_inicio[1]] = True
-    "marca la celda inicial como visitada"
+def extremos_validos(mapa, coordenada_inicio, coordenada_destino):
+    "Igual que en busqueda_por_anchura: ambos extremos dentro del mapa y sobre camino libre"
 
-    direcciones_movimiento = [(1, 0), (-1, 0), (0, 1), (0, -1)]
-    "son las direcciones (arriba, abajo, izquierda, derecha)"
+    if not (esta_dentro_de_limites(mapa, coordenada_inicio) and esta_dentro_de_limites(mapa, coordenada_destino)):
+        return False
+    valor_inicio = mapa[coordenada_inicio[0]][coordenada_inicio[1]]
+    valor_destino = mapa[coordenada_destino[0]][coordenada_destino[1]]
+    return valor_inicio not in (EDIFICIO, AGUA, ZONA_BLOQUEADA) and valor_destino not in (EDIFICIO, AGUA, ZONA_BLOQUEADA)
 
-    while cola:
-        "mientras la cola este vacia continua explorando"
+def reconstruir_ruta(previo, coordenada_final):
+    "Sigue el diccionario previo desde coordenada_final hasta la celda que no tiene anterior"
 
-        fila_actual, columna_actual = cola.popleft()
-        "saca el primer elemento de la cola"
+    ruta = []
+    posicion_actual = coordenada_final
+    while posicion_actual is not None:
+        ruta.append(posicion_actual)
+        posicion_actual = previo[posicion_actual]
+    ruta.reverse()
+    return ruta
 
-        if (fila_actual, columna_actual) == coordenada_destino:
-            break
-        "verifica si llegamos al destino"
-        for desplazamiento_fila, desplazamiento_columna in direcciones_movimiento:
-            "recorre las cuatro direcciones"
+def busqueda_a_estrella(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False):
+    "Busca la ruta más corta con A* usando la distancia Manhattan como heurística."
+
+    if not extremos_validos(mapa, coordenada_inicio, coordenada_destino):
+        return None
+
+    total_filas, total_columnas = len(mapa), len(mapa[0])
+    fila_destino, columna_destino = coordenada_destino
+    costo = {coordenada_inicio: 0}
+    previo = {coordenada_inicio: None}
+    abiertos = [(abs(coordenada_inicio[0] - fila_destino) + abs(coordenada_inicio[1] - columna_destino), 0, coordenada_inicio)]
+    "cada entrada es (g + h, -g, celda): a igual prioridad sale primero la que está más avanzada"
+
+    while abiertos:
+        _, menos_costo, posicion_actual = heapq.heappop(abiertos)
+        costo_actual = -menos_costo
+        if posicion_actual == coordenada_destino:
+            return reconstruir_ruta(previo, coordenada_destino)
+        if costo_actual > costo[posicion_actual]:
+            continue
+        "si ya se encontró un camino mejor a esta celda, la entrada del heap es vieja y se descarta"
 
+        fila_actual, columna_actual = posicion_actual
+        for desplazamiento_fila, desplazamiento_columna in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
             nueva_fila = fila_actual + desplazamiento_fila
             nueva_columna = columna_actual + desplazamiento_columna
-            "suma el movimiento a las posiciones actuales para tener las nuevas posiciones"
+            if not (0 <= nueva_fila < total_filas and 0 <= nueva_columna < total_columnas):
+                continue
+            valor = mapa[nueva_fila][nueva_columna]
+            if valor in (EDIFICIO, ZONA_BLOQUEADA) or (valor == AGUA and not permitir_agua):
+                continue
+
+            vecino = (nueva_fila, nueva_columna)
+            nuevo_costo = costo_actual + 1
+            if vecino not in costo or nuevo_costo < costo[vecino]:
+                costo[vecino] = nuevo_costo
+                previo[vecino] = posicion_actual
+                prioridad = nuevo_costo + abs(nueva_fila - fila_destino) + abs(nueva_columna - columna_destino)
+                heapq.heappush(abiertos, (prioridad, -nuevo_costo, vecino))
 
-            if 0 <= nueva_fila < total_filas and 0 <= nueva_columna < total_columnas and not visitado[nueva_fila][nueva_columna]:
-                "comprueba si la nueva posicion es valida"
+    return None
+
+def expandir_capa(mapa, frente, distancia, previo, distancia_otro_lado, permitir_agua):
+    "Expande una capa completa del BFS y devuelve el nuevo frente y el mejor cruce con el otro lado"
+
+    total_filas, total_columnas = len(mapa), len(mapa[0])
+    nuevo_frente = []
+    mejor_total, mejor_cruce = None, None
+    for posicion_actual in frente:
+        fila_actual, columna_actual = posicion_actual
+        distancia_vecino = distancia[posicion_actual] + 1
+        for desplazamiento_fila, desplazamiento_columna in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
+            nueva_fila = fila_actual + desplazamiento_fila
+            nueva_columna = columna_actual + desplazamiento_columna
+            if not (0 <= nueva_fila < total_filas and 0 <= nueva_columna < total_columnas):
+                continue
+            valor = mapa[nueva_fila][nueva_columna]
+            if valor in (EDIFICIO, ZONA_BLOQUEADA) or (valor == AGUA and not permitir_agua):
+                continue
 
-                valor = mapa[nueva_fila][nueva_columna]
-                if valor in (EDIFICIO, ZONA_BLOQUEADA):
-                    continue
-                "si es edificio o zona bloqueada no pasa por ahi"
+            vecino = (nueva_fila, nueva_columna)
+            if vecino in distancia_otro_lado:
+                total = distancia_vecino + distancia_otro_lado[vecino]
+                if mejor_total is None or total < mejor_total:
+                    mejor_total, mejor_cruce = total, (posicion_actual, vecino)
+            "si el vecino ya lo vio la otra búsqueda, hay un camino completo; se guarda el más corto de la capa"
 
-                if valor == AGUA and not permitir_agua:
-                    continue
-                "si es agua pero no esta permitido pasar por agua, no pasa por ahi"
+            if vecino not in distancia:
+                distancia[vecino] = distancia_vecino
+                previo[vecino] = posicion_actual
+                nuevo_frente.append(vecino)
+    return nuevo_frente, mejor_cruce
 
-                visitado[nueva_fila][nueva_columna] = True
-                previo[nueva_fila][nueva_columna] = (fila_actual, columna_actual)
-                cola.append((nueva_fila, nueva_columna))
-                "marco la celda como visitado, guarda la celda anterior y agrega a la cola"
+def busqueda_bidireccional(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False):
+    "Busca la ruta más corta con un BFS que avanza a la vez desde el inicio y desde el destino."
 
-    if not visitado[coordenada_destino[0]][coordenada_destino[1]]:
+    if not extremos_validos(mapa, coordenada_inicio, coordenada_destino):
+        return None
+    if coordenada_inicio == coordenada_destino:
+        return [coordenada_inicio]
+
+    distancia_inicio, previo_inicio = {coordenada_inicio: 0}, {coordenada_inicio: None}
+    distancia_destino, previo_destino = {coordenada_destino: 0}, {coordenada_destino: None}
+    frente_inicio, frente_destino = [coordenada_inicio], [coordenada_destino]
+
+    while frente_inicio and frente_destino:
+        "siempre se expande el frente más chico, una capa entera por vez"
+
+        if len(frente_inicio) <= len(frente_destino):
+            frente_inicio, cruce = expandir_capa(mapa, frente_inicio, distancia_inicio, previo_inicio, distancia_destino, permitir_agua)
+            if cruce:
+                celda_lado_inicio, celda_lado_destino = cruce
+                break
+        else:
+            frente_destino, cruce = expandir_capa(mapa, frente_destino, distancia_destino, previo_destino, distancia_inicio, permitir_agua)
+            if cruce:
+                celda_lado_destino, celda_lado_inicio = cruce
+                break
+    else:
         return None
-    "Si el destino nunca fue visitado, significa que no hay ruta posible"
 
-    ruta = []
-    posicion_actual = coordenada_destino
-    while posicion_actual:
+    ruta = reconstruir_ruta(previo_inicio, celda_lado_inicio)
+    posicion_actual = celda_lado_destino
+    while posicion_actual is not None:
         ruta.append(posicion_actual)
-        posicion_actual = previo[posicion_actual[0]][posicion_actual[1]]
-    ruta.reverse()
-    "reconstruye la ruta desde destino hasta inicio y agrega cada celda recorrida y dps lo invierte"
+        posicion_actual = previo_destino[posicion_actual]
+    "une la mitad que viene del inicio con la mitad que va hacia el destino"
     return ruta
 
-def encontrar_mejor_ruta(mapa, coordenada_inicio, coordenada_destino):
+def busqueda_tierra_luego_agua(mapa, coordenada_inicio, coordenada_destino, celdas=None):
+    "Hace en una sola pasada lo que encontrar_mejor_ruta hacía con dos BFS: ruta por tierra y, si no hay, por agua."
+
+    if not extremos_validos(mapa, coordenada_inicio, coordenada_destino):
+        return None, None
+
+    total_filas, total_columnas = len(mapa), len(mapa[0])
+    if celdas is None:
+        celdas = aplanar_mapa(mapa)
+    "igual que busqueda_por_anchura: el mapa aplanado, o el que pasa quien llama"
+
+    nucleo = nucleo_para(total_filas, total_columnas)
+    return nucleo.tierra_luego_agua(celdas, _TRANSITABLE[False], _TRANSITABLE[True],
+                                    coordenada_inicio[0] * total_columnas + coordenada_inicio[1],
+                                    coordenada_destino[0] * total_columnas + coordenada_destino[1])
+    "primero BFS por tierra con los arrays de nucleo_bfs.py; si no llega, sigue desde la orilla con agua sin volver a recorrer la tierra"
+
+ALGORITMOS_BUSQUEDA = {
+    'anchura': busqueda_por_anchura,
+    'a_estrella': busqueda_a_estrella,
+    'bidireccional': busqueda_bidireccional,
+}
+
+def encontrar_mejor_ruta(mapa, coordenada_inicio, coordenada_destino, algoritmo='anchura', celdas=None):
     "Intenta encontrar una ruta primero por tierra, y si no puede, por agua."
 
-    ruta_por_tierra = busqueda_por_anchura(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False)
+    if algoritmo == 'anchura':
+        return busqueda_tierra_luego_agua(mapa, coordenada_inicio, coordenada_destino, celdas)
+    "con BFS se usa la búsqueda de una sola pasada; celdas es el mapa ya aplanado, si se tiene"
+
+    buscar = ALGORITMOS_BUSQUEDA[algoritmo]
+    "elige la función de búsqueda; todas devuelven rutas de la misma longitud"
+
+    ruta_por_tierra = buscar(mapa, coordenada_inicio, coordenada_destino, permitir_agua=False)
     "llama a la funcion bfs para buscar por tierra"
 
     if ruta_por_tierra:
         return ruta_por_tierra, 'tierra'
     "si encontro la ruta devuelve la posicion y la palabra tierra"
 
-    ruta_por_agua = busqueda_por_anchura(mapa, coordenada_inicio, coordenada_destino, permitir_agua=True)
+    ruta_por_agua = buscar(mapa, coordenada_inicio, coordenada_destino, permitir_agua=True)
     "hace lo mismo pero ahora busca por el agua"
 
     if ruta_por_agua:
@@ -242,37 +336,63 @@ def encontrar_mejor_ruta(mapa, coordenada_inicio, coordenada_destino):
 "si no hay camino posible"
 
 # Bucle interactivo
-def bucle_interactivo(mapa):
-    posicion_inicio = None
-    posicion_destino = None
-    modo_detallado = False
-    ultima_ruta = None
-
-    print("Calculadora de rutas. Escribe 'ayuda' para ver los comandos.")
-
-    while True:
-        try:
-            entrada_usuario = input("> ").strip()
-        except (KeyboardInterrupt, EOFError):
-            print("\nSaliendo.")
-            break
-        "Si ocurre un error o interrupción el programa no se bloquea ni muestra un error, solo rompe el bucle"
-
-        if not entrada_usuario:
-            continue
-        "si el usuario no escribe nada y presiona enter vuelve a pedir otro comando"
-
-        partes_comando = entrada_usuario.split()
-        comando = partes_comando[0].lower()
-        "Divide el texto que escribió el usuario en partes (palabras separadas por espacios)"
-
-        if comando in ('salir', 'exit', 'q'):
-            print("Adiós.")
-            break
-        "Si el usuario escribió “salir”, “exit” o “q”, el programa se despide y rompe el bucle"
-
-        if comando == 'ayuda':
-            print("""Comandos disponibles:
+def crear_estado(mapa, salida_lote=None):
+    "Estado de una sesion de comandos; con salida_lote no se dibuja nada y cada buscar escribe una linea JSON"
+
+    return {
+        'mapa': mapa,
+        'posicion_inicio': None,
+        'posicion_destino': None,
+        'modo_detallado': False,
+        'ultima_ruta': None,
+        'algoritmo': 'anchura',
+        'ventana': 'auto',
+        'lote': salida_lote,
+        'linea': None,
+        'celdas': None,
+    }
+"los comandos comparten este diccionario, asi el modo interactivo y el modo por lotes hacen exactamente lo mismo; celdas es el mapa aplanado para el BFS, None cuando hay que rehacerlo"
+
+def avisar(estado, *texto):
+    "Mensaje para humanos: se imprime en modo interactivo y se omite en modo por lotes"
+
+    if estado['lote'] is None:
+        print(*texto)
+
+def avisar_error(estado, mensaje):
+    "En modo interactivo se imprime; en modo por lotes sale como linea JSON con el numero de linea"
+
+    if estado['lote'] is None:
+        print(mensaje)
+    else:
+        emitir(estado, {'error': mensaje})
+
+def emitir(estado, registro):
+    "Escribe un resultado JSON en la salida del modo por lotes"
+
+    estado['lote'].write(json.dumps(dict({'linea': estado['linea']}, **registro)) + '\n')
+
+def dibujar(estado, ruta):
+    "Dibuja el mapa salvo en modo por lotes"
+
+    if estado['lote'] is None:
+        imprimir_mapa(estado['mapa'], ruta_camino=ruta, posicion_inicio=estado['posicion_inicio'], posicion_destino=estado['posicion_destino'], modo_detallado=estado['modo_detallado'], ventana=estado['ventana'])
+
+def ejecutar_comando(estado, entrada_usuario):
+    "Procesa un comando de los que documenta 'ayuda'; devuelve False si el comando pide salir"
+
+    mapa = estado['mapa']
+    partes_comando = entrada_usuario.split()
+    comando = partes_comando[0].lower()
+    "Divide el texto que escribió el usuario en partes (palabras separadas por espacios)"
+
+    if comando in ('salir', 'exit', 'q'):
+        avisar(estado, "Adiós.")
+        return False
+    "Si el usuario escribió “salir”, “exit” o “q”, el programa se despide y termina"
+
+    if comando == 'ayuda':
+        avisar(estado, """Comandos disponibles:
  mostrar                       - dibuja el mapa actual
  inicio fila columna           - fija punto de inicio
  destino fila columna          - fija punto destino
@@ -283,109 +403,211 @@ def bucle_interactivo(mapa):
  cargar nombre_archivo         - carga mapa desde archivo
  guardar nombre_archivo        - guarda mapa en archivo
  alternar detallado            - muestra símbolos de agua y bloqueos
+ ventana completa|ruta|auto    - parte del mapa a dibujar (o ventana f0 c0 f1 c1)
+ algoritmo nombre              - elige la búsqueda (anchura, a_estrella, bidireccional)
  salir                         - salir del programa
 """)
-            continue
+        return True
 
-        # Mostrar mapa
-        if comando == 'mostrar':
-            imprimir_mapa(mapa, ruta_camino=ultima_ruta, posicion_inicio=posicion_inicio, posicion_destino=posicion_destino, modo_detallado=modo_detallado)
-            continue
+    # Mostrar mapa
+    if comando == 'mostrar':
+        dibujar(estado, estado['ultima_ruta'])
+        return True
 
-        # Redimensionar mapa
-        if comando == 'redimensionar' and len(partes_comando) >= 3:
-            "revisa que el usuario haya puesto al menos 3 palabras"
+    # Redimensionar mapa
+    if comando == 'redimensionar' and len(partes_comando) >= 3:
+        "revisa que el usuario haya puesto al menos 3 palabras"
 
-            try:
-                nuevas_filas = int(partes_comando[1])
-                nuevas_columnas = int(partes_comando[2])
-                "Convierte las palabras escritas por el usuario a números enteros"
+        try:
+            nuevas_filas = int(partes_comando[1])
+            nuevas_columnas = int(partes_comando[2])
+            "Convierte las palabras escritas por el usuario a números enteros"
+
+            if nuevas_filas <= 0 or nuevas_columnas <= 0:
+                "Se asegura de que las dimensiones sean mayores que cero"
+                avisar_error(estado, "Tamaño inválido.")
+                return True
+
+            mapa[:] = redimensionar_mapa(mapa, nuevas_filas, nuevas_columnas)
+            estado['celdas'] = None
+            "Crea un nuevo mapa con las medidas nuevas, copia las partes del mapa anterior y reemplaza el contenido de mapa con el nuevo"
+
+            generar_obstaculos_aleatorios(mapa)
+            "Después de crear el nuevo mapa, se llenan algunas celdas al azar con obstáculos"
+            avisar(estado, f"Mapa redimensionado a {nuevas_filas}x{nuevas_columnas} con obstáculos aleatorios.")
+
+        except ValueError:
+            "Si dentro del bloque try ocurre un error se atrapa el error con except y muestra un mensaje"
+            avisar_error(estado, "Uso: redimensionar filas columnas (por ejemplo: redimensionar 15 20)")
+        return True
 
-                if nuevas_filas <= 0 or nuevas_columnas <= 0:
-                    "Se asegura de que las dimensiones sean mayores que cero"
-                    print("Tamaño inválido.")
-                    continue
+    # Fijar inicio y destino
+    if comando in ('inicio', 'destino') and len(partes_comando) >= 3:
+        "Comprueba si el usuario escribió el comando y si se puso dos números"
 
-                mapa[:] = redimensionar_mapa(mapa, nuevas_filas, nuevas_columnas)
-                "Crea un nuevo mapa con las medidas nuevas, copia las partes del mapa anterior y reemplaza el contenido de mapa con el nuevo"
+        fila, columna = int(partes_comando[1]), int(partes_comando[2])
+        "Convierte los valores de texto a números enteros"
 
-                generar_obstaculos_aleatorios(mapa)
-                "Después de crear el nuevo mapa, se llenan algunas celdas al azar con obstáculos"
-                print(f"Mapa redimensionado a {nuevas_filas}x{nuevas_columnas} con obstáculos aleatorios.")
+        if not esta_dentro_de_limites(mapa, (fila, columna)):
+            avisar_error(estado, "Fuera del mapa.")
+            return True
 
-            except ValueError:
-                "Si dentro del bloque try ocurre un error se atrapa el error con except y muestra un mensaje"
-                print("Uso: redimensionar filas columnas (por ejemplo: redimensionar 15 20)")
-            continue
+        if mapa[fila][columna] in (EDIFICIO, AGUA, ZONA_BLOQUEADA):
+            avisar_error(estado, f"No se puede colocar {comando} sobre un obstáculo.")
+            return True
 
-        # Fijar inicio
-        if comando == 'inicio' and len(partes_comando) >= 3:
-            "Comprueba si el usuario escribió el comando y si se puso dos números"
+        estado['posicion_' + comando] = (fila, columna)
+        avisar(estado, "Inicio fijado en" if comando == 'inicio' else "Destino fijado en", (fila, columna))
+        return True
 
-            fila, columna = int(partes_comando[1]), int(partes_comando[2])
-            "Convierte los valores de texto a números enteros"
+    # Editar celdas
+    if comando in ('agregar', 'quitar') and len(partes_comando) >= 3:
+        fila, columna = int(partes_comando[1]), int(partes_comando[2])
+        tipo = CAMINO_LIBRE
+        if comando == 'agregar':
+            if len(partes_comando) < 4:
+                avisar_error(estado, "Uso: agregar fila columna tipo")
+                return True
+            tipo = int(partes_comando[3])
+        "quitar es agregar con tipo 0 (camino libre)"
+
+        if not esta_dentro_de_limites(mapa, (fila, columna)):
+            avisar_error(estado, "Fuera del mapa.")
+            return True
+        if tipo not in (CAMINO_LIBRE, EDIFICIO, AGUA, ZONA_BLOQUEADA):
+            avisar_error(estado, "Tipo inválido (0, 1, 2 o 3).")
+            return True
+
+        mapa[fila][columna] = tipo
+        estado['celdas'] = None
+        avisar(estado, f"Celda {(fila, columna)} = {tipo}.")
+        return True
 
-            if not esta_dentro_de_limites(mapa, (fila, columna)):
-                print("Fuera del mapa.")
-                continue
+    # Archivos
+    if comando == 'cargar' and len(partes_comando) >= 2:
+        mapa[:] = cargar_mapa_desde_archivo(partes_comando[1])
+        estado['celdas'] = None
+        "reemplaza el contenido de la lista para que la sesion siga usando el mismo mapa"
+        estado['posicion_inicio'] = estado['posicion_destino'] = estado['ultima_ruta'] = None
+        avisar(estado, "Mapa cargado desde", partes_comando[1])
+        return True
 
-            if mapa[fila][columna] in (EDIFICIO, AGUA, ZONA_BLOQUEADA):
-                print("No se puede colocar inicio sobre un obstáculo.")
-                continue
+    if comando == 'guardar' and len(partes_comando) >= 2:
+        guardar_mapa_en_archivo(mapa, partes_comando[1])
+        avisar(estado, "Mapa guardado en", partes_comando[1])
+        return True
 
-            posicion_inicio = (fila, columna)
-            print("Inicio fijado en", posicion_inicio)
-            continue
+    # Elegir parte visible del mapa
+    if comando == 'ventana' and len(partes_comando) >= 2:
+        try:
+            estado['ventana'] = renderizado.leer_ventana(partes_comando[1:])
+        except ValueError as error:
+            avisar_error(estado, str(error))
+            return True
+        avisar(estado, "Ventana =", estado['ventana'] or 'completa')
+        return True
+    "elige que parte del mapa se dibuja: todo, alrededor de la ruta, automatico o un rectangulo"
 
-        # Fijar destino
-        if comando == 'destino' and len(partes_comando) >= 3:
-            "Comprueba si el usuario escribió el comando y si se puso dos números"
+    # Alternar modo detallado
+    if comando == 'alternar' and len(partes_comando) >= 2 and partes_comando[1] == 'detallado':
+        estado['modo_detallado'] = not estado['modo_detallado']
+        avisar(estado, "Modo detallado =", estado['modo_detallado'])
+        return True
 
-            fila, columna = int(partes_comando[1]), int(partes_comando[2])
-            "Convierte los valores de texto a números enteros"
+    # Elegir algoritmo de busqueda
+    if comando == 'algoritmo' and len(partes_comando) >= 2:
+        if partes_comando[1] not in ALGORITMOS_BUSQUEDA:
+            avisar_error(estado, "Algoritmos disponibles: " + ', '.join(ALGORITMOS_BUSQUEDA))
+            return True
+        estado['algoritmo'] = partes_comando[1]
+        avisar(estado, "Algoritmo de búsqueda =", estado['algoritmo'])
+        return True
 
-            if not esta_dentro_de_limites(mapa, (fila, columna)):
-                print("Fuera del mapa.")
-                continue
+    # Buscar ruta
+    if comando == 'buscar':
+        posicion_inicio, posicion_destino = estado['posicion_inicio'], estado['posicion_destino']
+        if posicion_inicio is None or posicion_destino is None:
+            avisar_error(estado, "Define primero inicio y destino.")
+            return True
+
+        if estado['algoritmo'] == 'anchura' and estado['celdas'] is None:
+            estado['celdas'] = aplanar_mapa(mapa)
+        "el mapa aplanado se rehace sólo después de editarlo, no en cada busqueda"
+
+        ruta, tipo = encontrar_mejor_ruta(mapa, posicion_inicio, posicion_destino, estado['algoritmo'], estado['celdas'])
+        estado['ultima_ruta'] = ruta
+        if estado['lote'] is not None:
+            emitir(estado, {'inicio': posicion_inicio, 'destino': posicion_destino, 'tipo': tipo,
+                            'pasos': len(ruta) - 1 if ruta else None, 'ruta': ruta})
+        "en modo por lotes el resultado sale como una linea JSON"
+
+        if ruta:
+            avisar(estado, f"Ruta encontrada (modo: {tipo}). Pasos: {len(ruta) - 1}")
+            dibujar(estado, ruta)
+        else:
+            avisar(estado, "No hay ruta posible.")
+        return True
 
-            if mapa[fila][columna] in (EDIFICIO, AGUA, ZONA_BLOQUEADA):
-                print("No se puede colocar destino sobre un obstáculo.")
-                continue
+    avisar_error(estado, "Comando desconocido. Escribe 'ayuda' para ver los comandos.")
+    return True
 
-            posicion_destino = (fila, columna)
-            print("Destino fijado en", posicion_destino)
-            continue
+# Bucle interactivo
+def bucle_interactivo(mapa):
+    estado = crear_estado(mapa)
+
+    print("Calculadora de rutas. Escribe 'ayuda' para ver los comandos.")
+
+    while True:
+        try:
+            entrada_usuario = input("> ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print("\nSaliendo.")
+            break
+        "Si ocurre un error o interrupción el programa no se bloquea ni muestra un error, solo rompe el bucle"
 
-         # Alternar modo detallado
-        if comando == 'alternar' and len(partes_comando) >= 2 and partes_comando[1] == 'detallado':
-            modo_detallado = not modo_detallado
-            print("Modo detallado =", modo_detallado)
+        if not entrada_usuario:
             continue
+        "si el usuario no escribe nada y presiona enter vuelve a pedir otro comando"
 
-        # Buscar ruta
-        if comando == 'buscar':
-            if posicion_inicio is None or posicion_destino is None:
-                print("Define primero inicio y destino.")
-                continue
+        if not ejecutar_comando(estado, entrada_usuario):
+            break
 
-            ruta, tipo = encontrar_mejor_ruta(mapa, posicion_inicio, posicion_destino)
-            if ruta:
-                ultima_ruta = ruta
-                print(f"Ruta encontrada (modo: {tipo}). Pasos: {len(ruta) - 1}")
-                imprimir_mapa(mapa, ruta_camino=ruta, posicion_inicio=posicion_inicio, posicion_destino=posicion_destino, modo_detallado=modo_detallado)
-            
+# Modo por lotes
+def ejecutar_lote(mapa, lineas, salida=None):
+    "Ejecuta comandos desde un archivo o stdin sin dibujar nada; cada buscar y cada error escriben una linea JSON"
 
-            else:
-                ultima_ruta = None
-                print("No hay ruta posible.")
+    salida = salida or sys.stdout
+    estado = crear_estado(mapa, salida)
+
+    for numero_linea, linea in enumerate(lineas, 1):
+        entrada_usuario = linea.strip()
+        if not entrada_usuario or entrada_usuario.startswith('#'):
             continue
+        "salta lineas vacias y comentarios"
+
+        estado['linea'] = numero_linea
+        try:
+            if not ejecutar_comando(estado, entrada_usuario):
+                break
+        except (ValueError, OSError) as error:
+            avisar_error(estado, str(error))
+        "un comando mal escrito o un archivo que no existe no corta el lote: queda registrado como error"
 
-        print("Comando desconocido. Escribe 'ayuda' para ver los comandos.")
+    salida.flush()
 
 # Programa principal
+# python calculadora.py                   -> modo interactivo
+# python calculadora.py --lote [archivo]  -> comandos desde archivo (o stdin), salida JSON
 if __name__ == "__main__":
     random.seed()
     mapa_inicial = crear_mapa_vacio(10, 10)
     generar_obstaculos_aleatorios(mapa_inicial)
-    print("Mapa de ejemplo con obstáculos aleatorios generado. Usa 'ayuda' para ver comandos.")
-    bucle_interactivo(mapa_inicial)
+    if len(sys.argv) > 1 and sys.argv[1] == '--lote':
+        if len(sys.argv) > 2 and sys.argv[2] != '-':
+            with open(sys.argv[2], encoding='utf-8') as archivo_comandos:
+                ejecutar_lote(mapa_inicial, archivo_comandos)
+        else:
+            ejecutar_lote(mapa_inicial, sys.stdin)
+    else:
+        print("Mapa de ejemplo con obstáculos aleatorios generado. Usa 'ayuda' para ver comandos.")
+        bucle_interactivo(mapa_inicial)
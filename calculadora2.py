@@ -1,5 +1,24 @@
-from collections import deque
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import heapq
+import itertools
+import json
+import mmap
+from multiprocessing import shared_memory
+import os
 import random
+import re
+import struct
+import sys
+import tempfile
+import zlib
+
+from instrumentacion import SumideroEnMemoria, SumideroJSONL, medir_consulta
+from lector_mapas import leer_mapa_texto
+from nucleo_bfs import NucleoBFS
+import renderizado
 
 # ---------------------------
 # CONSTANTES
@@ -9,34 +28,265 @@ EDIFICIO = 1
 AGUA = 2
 ZONA_BLOQUEADA = 3
 
+# Coste de entrar a cada tipo de celda; un tipo ausente es intransitable
+COSTOS_TERRENO = {CAMINO_LIBRE: 1, AGUA: 5}
+
+
+@contextmanager
+def _reemplazar_archivo(ruta, modo):
+    # Escribe en un temporal del mismo directorio y, si todo sale bien, lo pone en lugar
+    # de `ruta` con os.replace. Un mapa cargado con mmap es una vista sobre su archivo:
+    # abrir esa misma ruta con 'wb' la truncaría debajo del mapeo.
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ruta)),
+                                    prefix='.' + os.path.basename(ruta) + '.', suffix='.tmp')
+    # mkstemp crea con permisos 0600; se dejan los de un open() común
+    mascara = os.umask(0)
+    os.umask(mascara)
+    os.chmod(temporal, 0o666 & ~mascara)
+    try:
+        with open(fd, modo, **({} if 'b' in modo else {'encoding': 'utf-8'})) as f:
+            yield f
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
 
 # ---------------------------
 # CLASE MAPA
 # ---------------------------
+# Contador global: cada cambio de cualquier mapa recibe un número de versión nuevo, así
+# un mapa recién cargado nunca comparte versión con el que reemplaza.
+_VERSIONES = itertools.count(1)
+MAX_CAMBIOS_REGISTRADOS = 10000
+CANTIDAD_REFERENCIAS = 8  # puntos de referencia ALT por defecto
+
+# Generación con semilla: el mapa se arma en bloques de filas, cada uno con su propio
+# generador derivado de (semilla, número de bloque), así el resultado no depende de
+# cuántos procesos lo generen. Por debajo del umbral no vale la pena arrancar procesos.
+FILAS_POR_BLOQUE = 256
+UMBRAL_GENERACION_PARALELA = 1 << 22
+MAX_NODOS_CORREDOR = 1 << 18  # tamaño máximo de la grilla del laberinto de un corredor
+
+# Formato binario: cabecera fija de 16 bytes (magia, versión, reservado, filas, columnas)
+# seguida de las celdas crudas, un byte cada una y fila tras fila.
+MAGIA_BINARIA = b'MAPA'
+VERSION_FORMATO = 1
+EXTENSION_BINARIA = '.bin'
+_CABECERA = struct.Struct('<4sHHII')
+
+# Tablas ALT guardadas junto al mapa (ruta + '.alt'): una o más secciones, cada una con
+# cabecera (magia, versión, permitir_agua, filas, columnas, cantidad, crc32 de las celdas),
+# los índices de los puntos de referencia y sus distancias, todo uint32 little-endian.
+MAGIA_REFERENCIAS = b'ALTR'
+EXTENSION_REFERENCIAS = '.alt'
+_CABECERA_REFERENCIAS = struct.Struct('<4sHHIIII')
+
+
+def _tabla_obstaculos(prob_edificio, prob_agua, prob_bloqueo):
+    # Traduce un byte aleatorio (0-255) a un tipo de celda según los umbrales
+    # acumulados; la resolución de las probabilidades es de 1/256.
+    umbral_edificio = round(256 * prob_edificio)
+    umbral_agua = round(256 * (prob_edificio + prob_agua))
+    umbral_bloqueo = round(256 * (prob_edificio + prob_agua + prob_bloqueo))
+    tabla = bytearray(256)
+    for b in range(256):
+        if b < umbral_edificio:
+            tabla[b] = EDIFICIO
+        elif b < umbral_agua:
+            tabla[b] = AGUA
+        elif b < umbral_bloqueo:
+            tabla[b] = ZONA_BLOQUEADA
+        else:
+            tabla[b] = CAMINO_LIBRE
+    return bytes(tabla)
+
+
 class Mapa:
     def __init__(self, filas, columnas, valor_relleno=CAMINO_LIBRE):
         self.filas = filas
         self.columnas = columnas
-        self.matriz = [[valor_relleno for _ in range(columnas)] for _ in range(filas)]
+        # Un byte por celda, fila tras fila: la celda (f, c) vive en f*columnas + c
+        self.celdas = bytearray([valor_relleno]) * (filas * columnas)
+        self.version = next(_VERSIONES)
+        self._componentes = None
+        self._referencias = {}  # permitir_agua -> PuntosDeReferencia (ALT)
+        # Registro de las últimas ediciones de una celda: (versión, índice de celda)
+        self._cambios = deque(maxlen=MAX_CAMBIOS_REGISTRADOS)
+        self._version_base = self.version  # último cambio de todo el mapa
+        self._version_descartada = 0       # última entrada que se cayó del registro
+        self.costos = dict(COSTOS_TERRENO)
+
+    def fijar_costos(self, costos):
+        # Los costes no cambian qué celdas se pueden pisar: sólo se renueva la versión para
+        # invalidar la caché de rutas, sin tocar el registro de cambios ni los componentes.
+        for tipo, costo in costos.items():
+            if not isinstance(costo, int) or costo < 1:
+                raise ValueError(f"Coste inválido para el terreno {tipo}: {costo} (debe ser un entero >= 1)")
+        self.costos = dict(costos)
+        self.version = next(_VERSIONES)
+
+    def _modificado(self, indice=None, valor_anterior=None):
+        # indice=None: cambió todo el mapa y el índice de componentes se descarta;
+        # con una sola celda el índice se actualiza en el lugar.
+        self.version = next(_VERSIONES)
+        self._referencias = {}  # las distancias ALT sólo valen para el mapa sin cambios
+        if indice is None:
+            self._cambios.clear()
+            self._version_base = self.version
+        else:
+            if len(self._cambios) == self._cambios.maxlen:
+                self._version_descartada = self._cambios[0][0]
+            self._cambios.append((self.version, indice))
+        if self._componentes is not None:
+            if indice is None:
+                self._componentes = None
+            else:
+                for componentes in self._componentes.values():
+                    componentes.actualizar(indice, valor_anterior)
+
+    def cambios_desde(self, version):
+        # Índices de las celdas editadas después de `version`, o None si en el medio hubo
+        # un cambio de todo el mapa o el registro ya no alcanza para saberlo.
+        if version < self._version_base or version < self._version_descartada:
+            return None
+        return [indice for v, indice in self._cambios if v > version]
+
+    def indice_componentes(self, permitir_agua=False):
+        if self._componentes is None:
+            self._componentes = {}
+        if permitir_agua not in self._componentes:
+            self._componentes[permitir_agua] = IndiceComponentes(self, permitir_agua)
+        return self._componentes[permitir_agua]
+
+    def preparar_referencias(self, cantidad=CANTIDAD_REFERENCIAS, permitir_agua=False):
+        # Preproceso ALT: elige los puntos de referencia y calcula sus distancias BFS.
+        # Cualquier edición del mapa lo descarta.
+        self._referencias[permitir_agua] = PuntosDeReferencia(self, cantidad, permitir_agua)
+        return self._referencias[permitir_agua]
+
+    def referencias(self, permitir_agua=False):
+        return self._referencias.get(permitir_agua)
+
+    def mismo_componente(self, a, b, permitir_agua=False):
+        # False también si alguno de los dos extremos no es transitable
+        indice = self.indice_componentes(permitir_agua)
+        componente = indice.componente(a[0]*self.columnas + a[1])
+        return componente != 0 and componente == indice.componente(b[0]*self.columnas + b[1])
+
+    @property
+    def matriz(self):
+        # Vistas por fila sobre el buffer (sin copias): matriz[f][c] se puede leer y asignar.
+        # Escribir por aquí no cambia la versión ni el índice de componentes; para editar
+        # usa agregar/quitar_obstaculo.
+        vista = memoryview(self.celdas)
+        return [vista[i*self.columnas:(i+1)*self.columnas] for i in range(self.filas)]
+
+    @matriz.setter
+    def matriz(self, filas):
+        self.filas = len(filas)
+        self.columnas = len(filas[0]) if filas else 0
+        self.celdas = bytearray(v for fila in filas for v in fila)
+        self._modificado()
 
     def generar_obstaculos_aleatorios(self, prob_edificio=0.15, prob_agua=0.10, prob_bloqueo=0.05):
-        for i in range(self.filas):
-            for j in range(self.columnas):
-                rnd = random.random()
-                if rnd < prob_edificio:
-                    self.matriz[i][j] = EDIFICIO
-                elif rnd < prob_edificio + prob_agua:
-                    self.matriz[i][j] = AGUA
-                elif rnd < prob_edificio + prob_agua + prob_bloqueo:
-                    self.matriz[i][j] = ZONA_BLOQUEADA
-                else:
-                    self.matriz[i][j] = CAMINO_LIBRE
+        tabla = _tabla_obstaculos(prob_edificio, prob_agua, prob_bloqueo)
+        self.celdas[:] = random.randbytes(len(self.celdas)).translate(tabla)
+        self._modificado()
+
+    @staticmethod
+    def generar(filas, columnas, semilla, prob_edificio=0.15, prob_agua=0.10, prob_bloqueo=0.05,
+                conectar=None, procesos=None):
+        # Mapa reproducible: la misma semilla da el mismo mapa con cualquier número de
+        # procesos. `conectar` es una lista de celdas que quedan unidas por tierra: entre
+        # cada par consecutivo se talla un corredor (ver tallar_corredor).
+        tabla = _tabla_obstaculos(prob_edificio, prob_agua, prob_bloqueo)
+        tareas = [(semilla, i, min(FILAS_POR_BLOQUE, filas - f) * columnas, tabla)
+                  for i, f in enumerate(range(0, filas, FILAS_POR_BLOQUE))]
+        procesos = procesos or os.cpu_count() or 1
+        if procesos == 1 or len(tareas) < 2 or filas * columnas < UMBRAL_GENERACION_PARALELA:
+            bloques = [_bloque_obstaculos(*tarea) for tarea in tareas]
+        else:
+            with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+                bloques = list(ejecutor.map(_bloque_obstaculos, *zip(*tareas)))
+
+        mapa = Mapa(0, 0)
+        mapa.filas, mapa.columnas, mapa.celdas = filas, columnas, bytearray().join(bloques)
+        for i, (a, b) in enumerate(zip(conectar or (), (conectar or ())[1:])):
+            mapa._tallar(a, b, random.Random(f"{semilla}-corredor-{i}"))
+        mapa._modificado()
+        return mapa
+
+    def tallar_corredor(self, a, b, semilla=None):
+        # Abre un camino por tierra entre a y b. Como el generador de laberinto.c: un DFS
+        # aleatorio sobre una grilla de nodos separados por `paso` celdas, que se corta al
+        # llegar al nodo de b; la pila del DFS es en ese momento un camino sinuoso de a a b
+        # y sólo esos tramos se excavan. El resto del mapa no se toca.
+        self._tallar(a, b, random.Random(semilla))
+        self._modificado()
+
+    def _tallar(self, a, b, azar):
+        for f, c in (a, b):
+            if not self.dentro_de_limites(f, c):
+                raise ValueError(f"Celda fuera del mapa: {(f, c)}")
+        f0, f1 = min(a[0], b[0]), max(a[0], b[0])
+        c0, c1 = min(a[1], b[1]), max(a[1], b[1])
+        # La grilla cubre el rectángulo entre a y b, con un margen para poder serpentear
+        margen = max(2, (f1 - f0 + c1 - c0) // 4)
+        f0, c0 = max(0, f0 - margen), max(0, c0 - margen)
+        f1, c1 = min(self.filas - 1, f1 + margen), min(self.columnas - 1, c1 + margen)
+        paso = 2
+        while ((f1 - f0) // paso + 1) * ((c1 - c0) // paso + 1) > MAX_NODOS_CORREDOR:
+            paso += 1
+        alto, ancho = (f1 - f0) // paso + 1, (c1 - c0) // paso + 1
+
+        def nodo(celda):
+            return (min((celda[0] - f0 + paso // 2) // paso, alto - 1),
+                    min((celda[1] - c0 + paso // 2) // paso, ancho - 1))
+
+        def celda(n):
+            return f0 + n[0] * paso, c0 + n[1] * paso
+
+        inicio, fin = nodo(a), nodo(b)
+        visitado = bytearray(alto * ancho)
+        visitado[inicio[0] * ancho + inicio[1]] = 1
+        pila = [(inicio, self._direcciones_al_azar(azar))]
+        while pila and pila[-1][0] != fin:
+            actual, direcciones = pila[-1]
+            if not direcciones:
+                pila.pop()
+                continue
+            df, dc = direcciones.pop()
+            vecino = (actual[0] + df, actual[1] + dc)
+            if 0 <= vecino[0] < alto and 0 <= vecino[1] < ancho and not visitado[vecino[0] * ancho + vecino[1]]:
+                visitado[vecino[0] * ancho + vecino[1]] = 1
+                pila.append((vecino, self._direcciones_al_azar(azar)))
+
+        puntos = [a] + [celda(n) for n, _ in pila] + [b]
+        for desde, hasta in zip(puntos, puntos[1:]):
+            self._excavar(desde, hasta)
+
+    @staticmethod
+    def _direcciones_al_azar(azar):
+        direcciones = list(MOVIMIENTOS)
+        azar.shuffle(direcciones)
+        return direcciones
+
+    def _excavar(self, desde, hasta):
+        # Tramo en L: primero en vertical y después en horizontal
+        (fa, ca), (fb, cb) = desde, hasta
+        paso_f = 1 if fb >= fa else -1
+        for f in range(fa, fb + paso_f, paso_f):
+            self.celdas[f * self.columnas + ca] = CAMINO_LIBRE
+        paso_c = 1 if cb >= ca else -1
+        for c in range(ca, cb + paso_c, paso_c):
+            self.celdas[fb * self.columnas + c] = CAMINO_LIBRE
 
     def dentro_de_limites(self, f, c):
         return 0 <= f < self.filas and 0 <= c < self.columnas
 
     def es_transitable(self, f, c, permitir_agua=False):
-        valor = self.matriz[f][c]
+        valor = self.celdas[f*self.columnas + c]
         if valor == CAMINO_LIBRE:
             return True
         if valor == AGUA and permitir_agua:
@@ -45,71 +295,949 @@ class Mapa:
 
     def agregar_obstaculo(self, f, c, tipo):
         if self.dentro_de_limites(f, c):
-            self.matriz[f][c] = tipo
+            indice = f*self.columnas + c
+            anterior = self.celdas[indice]
+            self.celdas[indice] = tipo
+            self._modificado(indice, anterior)
 
     def quitar_obstaculo(self, f, c):
         if self.dentro_de_limites(f, c):
-            self.matriz[f][c] = CAMINO_LIBRE
+            indice = f*self.columnas + c
+            anterior = self.celdas[indice]
+            self.celdas[indice] = CAMINO_LIBRE
+            self._modificado(indice, anterior)
 
     def redimensionar(self, nuevas_filas, nuevas_columnas, valor_relleno=CAMINO_LIBRE):
-        nuevo_mapa = [[valor_relleno for _ in range(nuevas_columnas)] for _ in range(nuevas_filas)]
-        for i in range(min(self.filas, nuevas_filas)):
-            for j in range(min(self.columnas, nuevas_columnas)):
-                nuevo_mapa[i][j] = self.matriz[i][j]
-        self.filas, self.columnas, self.matriz = nuevas_filas, nuevas_columnas, nuevo_mapa
+        nuevas = bytearray([valor_relleno]) * (nuevas_filas * nuevas_columnas)
+        filas_comunes = min(self.filas, nuevas_filas)
+        if nuevas_columnas == self.columnas:
+            fin = filas_comunes * nuevas_columnas
+            nuevas[:fin] = self.celdas[:fin]
+        else:
+            ancho = min(self.columnas, nuevas_columnas)
+            for i in range(filas_comunes):
+                origen = i * self.columnas
+                destino = i * nuevas_columnas
+                nuevas[destino:destino+ancho] = self.celdas[origen:origen+ancho]
+        self.filas, self.columnas, self.celdas = nuevas_filas, nuevas_columnas, nuevas
+        self._modificado()
 
-    def guardar(self, ruta):
-        with open(ruta, 'w', encoding='utf-8') as f:
-            for fila in self.matriz:
-                f.write(' '.join(str(x) for x in fila) + '\n')
+    def guardar(self, ruta, binario=None):
+        # binario=None elige por extensión: '.bin' usa el formato binario
+        if binario is None:
+            binario = ruta.endswith(EXTENSION_BINARIA)
+        if binario:
+            with _reemplazar_archivo(ruta, 'wb') as f:
+                f.write(_CABECERA.pack(MAGIA_BINARIA, VERSION_FORMATO, 0, self.filas, self.columnas))
+                f.write(self.celdas)
+        else:
+            with _reemplazar_archivo(ruta, 'w') as f:
+                for i in range(self.filas):
+                    fila = self.celdas[i*self.columnas:(i+1)*self.columnas]
+                    f.write(' '.join(map(str, fila)) + '\n')
+        if self._referencias:
+            with _reemplazar_archivo(ruta + EXTENSION_REFERENCIAS, 'wb') as f:
+                for referencias in self._referencias.values():
+                    referencias.escribir(f)
+        elif os.path.exists(ruta + EXTENSION_REFERENCIAS):
+            # Un .alt de una versión anterior del mapa ya no sirve
+            os.remove(ruta + EXTENSION_REFERENCIAS)
 
     @staticmethod
-    def cargar(ruta):
-        matriz = []
-        with open(ruta, 'r', encoding='utf-8') as f:
-            for linea in f:
-                if linea.strip():
-                    matriz.append([int(x) for x in linea.split()])
-        filas, columnas = len(matriz), len(matriz[0])
-        mapa = Mapa(filas, columnas)
-        mapa.matriz = matriz
+    def cargar(ruta, usar_mmap=True):
+        # Detecta el formato por los primeros bytes. El binario se mapea en memoria por
+        # defecto: abrir es inmediato y sólo se leen del disco las páginas que se tocan.
+        with open(ruta, 'rb') as f:
+            es_binario = f.read(len(MAGIA_BINARIA)) == MAGIA_BINARIA
+        if es_binario:
+            mapa = Mapa._cargar_binario(ruta, usar_mmap)
+        else:
+            filas, columnas, celdas = leer_mapa_texto(ruta)
+            mapa = Mapa(0, 0)
+            mapa.filas, mapa.columnas, mapa.celdas = filas, columnas, celdas
+            mapa._modificado()
+        if os.path.exists(ruta + EXTENSION_REFERENCIAS):
+            mapa._cargar_referencias(ruta + EXTENSION_REFERENCIAS)
         return mapa
 
-    def mostrar(self, ruta=None, inicio=None, destino=None, modo_detallado=False):
-        ruta_set = set(ruta) if ruta else set()
-        for f in range(self.filas):
-            linea = []
-            for c in range(self.columnas):
-                coord = (f, c)
-                if coord == inicio:
-                    simbolo = 'I'
-                elif coord == destino:
-                    simbolo = 'D'
-                elif coord in ruta_set:
-                    simbolo = '*'
-                else:
-                    valor = self.matriz[f][c]
-                    if valor == CAMINO_LIBRE:
-                        simbolo = '.'
-                    elif valor == EDIFICIO:
-                        simbolo = 'X'
-                    elif valor == AGUA:
-                        simbolo = '~' if modo_detallado else 'X'
-                    elif valor == ZONA_BLOQUEADA:
-                        simbolo = 'T' if modo_detallado else 'X'
-                    else:
-                        simbolo = '?'
-                linea.append(simbolo)
-            print(' '.join(linea))
-        print()
+    def _cargar_referencias(self, ruta):
+        # Las secciones de otro mapa (tamaño o contenido distinto) se ignoran en silencio:
+        # el archivo quedó viejo y basta con volver a preparar_referencias. El .alt es sólo
+        # una caché: si está truncado o dañado se descarta y el mapa se abre igual.
+        suma = zlib.crc32(self.celdas)
+        try:
+            with open(ruta, 'rb') as f:
+                while True:
+                    referencias = PuntosDeReferencia.leer(f, self, suma)
+                    if referencias is False:
+                        break
+                    if referencias is not None:
+                        self._referencias[referencias.permitir_agua] = referencias
+        except (ValueError, EOFError, OSError):
+            self._referencias = {}
+
+    @staticmethod
+    def _cargar_binario(ruta, usar_mmap):
+        with open(ruta, 'rb') as f:
+            cabecera = f.read(_CABECERA.size)
+            if len(cabecera) < _CABECERA.size:
+                raise ValueError(f"Archivo de mapa truncado: la cabecera tiene {len(cabecera)} bytes "
+                                 f"y se esperaban {_CABECERA.size}")
+            magia, version, _, filas, columnas = _CABECERA.unpack(cabecera)
+            if magia != MAGIA_BINARIA:
+                raise ValueError("El archivo no es un mapa binario: falta la marca " + MAGIA_BINARIA.decode())
+            if version != VERSION_FORMATO:
+                raise ValueError(f"Versión de formato de mapa no soportada: {version}")
+            total = filas * columnas
+            if usar_mmap and total:
+                # ACCESS_COPY: las ediciones quedan en memoria y nunca se escriben al archivo
+                mapeo = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                celdas = memoryview(mapeo)[_CABECERA.size:_CABECERA.size + total]
+            else:
+                celdas = bytearray(f.read(total))
+        if len(celdas) != total:
+            raise ValueError(f"Archivo de mapa truncado: se esperaban {total} celdas y hay {len(celdas)}")
+        mapa = Mapa(0, 0)
+        mapa.filas, mapa.columnas, mapa.celdas = filas, columnas, celdas
+        mapa._modificado()
+        return mapa
+
+    def mostrar(self, ruta=None, inicio=None, destino=None, modo_detallado=False, ventana=None):
+        # ventana: None (todo), 'ruta', 'auto' o (f0, c0, f1, c1); ver renderizado.py
+        celdas, columnas = self.celdas, self.columnas
+        renderizado.mostrar(lambda f, c0, c1: celdas[f*columnas + c0:f*columnas + c1], self.filas, columnas,
+                            ruta, inicio, destino, modo_detallado, ventana)
+
+# ---------------------------
+# CLASE INDICE DE COMPONENTES
+# ---------------------------
+_TRAMOS = re.compile(rb'\x01+')
+
+
+def _tabla_transitable(permitir_agua):
+    # Valor de celda -> 1 si se puede pisar, 0 si no (mismas reglas que es_transitable)
+    tabla = bytearray(256)
+    tabla[CAMINO_LIBRE] = 1
+    if permitir_agua:
+        tabla[AGUA] = 1
+    return bytes(tabla)
+
+
+def _tabla_costos(costos, permitir_agua=True):
+    # Valor de celda -> coste de entrar (0 = intransitable)
+    tabla = [0] * 256
+    for tipo, costo in costos.items():
+        if tipo != AGUA or permitir_agua:
+            tabla[tipo] = costo
+    return tabla
+
+
+class IndiceComponentes:
+    # Etiqueta cada celda transitable con su región conexa (0 = no transitable). Las
+    # etiquetas guardadas son "crudas": la región real es la raíz en el union-find
+    # self.padre, lo que permite fusionar regiones sin tocar sus celdas.
+    # Con etiquetas y padre se adopta un índice ya armado (p. ej. por el proceso principal,
+    # vía memoria compartida) en vez de etiquetar el mapa.
+    def __init__(self, mapa, permitir_agua=False, etiquetas=None, padre=None):
+        self.mapa = mapa
+        self.permitir_agua = permitir_agua
+        self.transitable = _tabla_transitable(permitir_agua)
+        if etiquetas is None:
+            self._etiquetar_todo()
+        else:
+            self.etiquetas, self.padre = etiquetas, padre
+
+    def _etiquetar_todo(self):
+        # Una pasada por filas trabajando con tramos horizontales de celdas transitables:
+        # cada tramo se une con las etiquetas que tiene justo encima en la fila anterior.
+        mapa = self.mapa
+        columnas = mapa.columnas
+        etiquetas = self.etiquetas = array('i', bytes(4 * mapa.filas * columnas))
+        self.padre = array('i', [0])
+        for f in range(mapa.filas):
+            base = f * columnas
+            fila = bytes(mapa.celdas[base:base+columnas]).translate(self.transitable)
+            for tramo in _TRAMOS.finditer(fila):
+                a, b = tramo.span()
+                arriba = set(etiquetas[base-columnas+a:base-columnas+b]) if f else ()
+                etiqueta = 0
+                for otra in arriba:
+                    if otra:
+                        etiqueta = self._unir(etiqueta, otra) if etiqueta else self._raiz(otra)
+                if not etiqueta:
+                    etiqueta = self._nueva_etiqueta()
+                etiquetas[base+a:base+b] = array('i', [etiqueta]) * (b - a)
+
+    def _nueva_etiqueta(self):
+        self.padre.append(len(self.padre))
+        return len(self.padre) - 1
+
+    def _raiz(self, etiqueta):
+        padre = self.padre
+        while padre[etiqueta] != etiqueta:
+            padre[etiqueta] = padre[padre[etiqueta]]
+            etiqueta = padre[etiqueta]
+        return etiqueta
+
+    def _unir(self, a, b):
+        a, b = self._raiz(a), self._raiz(b)
+        if a != b:
+            self.padre[b] = a
+        return a
+
+    def componente(self, indice):
+        return self._raiz(self.etiquetas[indice])
+
+    def _vecinos(self, indice):
+        columnas = self.mapa.columnas
+        f, c = divmod(indice, columnas)
+        if f > 0:
+            yield indice - columnas
+        if f < self.mapa.filas - 1:
+            yield indice + columnas
+        if c > 0:
+            yield indice - 1
+        if c < columnas - 1:
+            yield indice + 1
+
+    def actualizar(self, indice, valor_anterior):
+        antes = self.transitable[valor_anterior]
+        ahora = self.transitable[self.mapa.celdas[indice]]
+        if antes and not ahora:
+            self._cerrar(indice)
+        elif ahora and not antes:
+            self._abrir(indice)
+
+    def _abrir(self, indice):
+        # La celda nueva une a todas las regiones que toca
+        etiquetas = self.etiquetas
+        raices = {self._raiz(etiquetas[v]) for v in self._vecinos(indice) if etiquetas[v]}
+        if not raices:
+            etiquetas[indice] = self._nueva_etiqueta()
+            return
+        raiz = raices.pop()
+        for otra in raices:
+            raiz = self._unir(raiz, otra)
+        etiquetas[indice] = raiz
+
+    def _cerrar(self, indice):
+        # Puede partir la región. Se lanza un BFS desde cada vecino, intercalados paso a
+        # paso; los que se encuentran se fusionan. Un grupo que se agota sin encontrar a
+        # los demás es una región separada y recibe etiqueta nueva. En cuanto queda un solo
+        # grupo vivo se para: el resto conserva la etiqueta vieja, así el trabajo es
+        # proporcional a las partes que se separan, no a toda la región.
+        etiquetas = self.etiquetas
+        etiquetas[indice] = 0
+        vecinos = [v for v in self._vecinos(indice) if etiquetas[v]]
+        if len(vecinos) < 2:
+            return
+
+        dueno = {}
+        grupo_de = list(range(len(vecinos)))
+        colas, celdas = [], []
+        for g, v in enumerate(vecinos):
+            dueno[v] = g
+            colas.append(deque([v]))
+            celdas.append([v])
+        activos = list(range(len(vecinos)))
+
+        def raiz_grupo(g):
+            while grupo_de[g] != g:
+                g = grupo_de[g]
+            return g
+
+        while len(activos) > 1:
+            for g in list(activos):
+                if g not in activos:
+                    continue
+                if len(activos) == 1:
+                    break
+                cola = colas[g]
+                if not cola:
+                    nueva = self._nueva_etiqueta()
+                    for celda in celdas[g]:
+                        etiquetas[celda] = nueva
+                    activos.remove(g)
+                    continue
+                actual = cola.popleft()
+                for v in self._vecinos(actual):
+                    if not etiquetas[v]:
+                        continue
+                    otro = dueno.get(v)
+                    if otro is None:
+                        dueno[v] = g
+                        cola.append(v)
+                        celdas[g].append(v)
+                        continue
+                    otro = raiz_grupo(otro)
+                    if otro != g:
+                        grupo_de[otro] = g
+                        cola.extend(colas[otro])
+                        celdas[g].extend(celdas[otro])
+                        colas[otro], celdas[otro] = None, None
+                        activos.remove(otro)
+
+
+# ---------------------------
+# CLASE PUNTOS DE REFERENCIA (ALT)
+# ---------------------------
+_INALCANZABLE = 0xFFFFFFFF
+
+
+class PuntosDeReferencia:
+    # A*, Landmarks y desigualdad triangular: con d(L, x) la distancia BFS desde cada
+    # punto de referencia L, |d(L, v) - d(L, t)| es una cota inferior de d(v, t). Cada
+    # tabla es un array('I') de una entrada por celda (4 bytes), _INALCANZABLE fuera del
+    # componente de L. Los puntos se eligen lejos entre sí: cada nuevo es la celda que
+    # maximiza la distancia al más cercano de los ya elegidos.
+    def __init__(self, mapa, cantidad=CANTIDAD_REFERENCIAS, permitir_agua=False, puntos=None, distancias=None):
+        self.mapa = mapa
+        self.permitir_agua = permitir_agua
+        self.transitable = _tabla_transitable(permitir_agua)
+        if puntos is None:
+            puntos, distancias = self._elegir(cantidad)
+        self.puntos = puntos
+        self.distancias = distancias
+
+    def _bfs(self, origen):
+        mapa = self.mapa
+        filas, columnas, celdas, transitable = mapa.filas, mapa.columnas, mapa.celdas, self.transitable
+        distancia = array('I', [_INALCANZABLE]) * (filas * columnas)
+        distancia[origen] = 0
+        cola = deque([origen])
+        ultimo = len(distancia)
+        while cola:
+            actual = cola.popleft()
+            siguiente = distancia[actual] + 1
+            c = actual % columnas
+            for vecino in (actual - columnas, actual + columnas,
+                           actual - 1 if c else -1, actual + 1 if c + 1 < columnas else -1):
+                if 0 <= vecino < ultimo and distancia[vecino] == _INALCANZABLE and transitable[celdas[vecino]]:
+                    distancia[vecino] = siguiente
+                    cola.append(vecino)
+        return distancia
+
+    def _elegir(self, cantidad):
+        celdas, transitable = self.mapa.celdas, self.transitable
+        libres = [i for i in range(len(celdas)) if transitable[celdas[i]]]
+        if not libres:
+            return [], []
+        # Arranque: la celda más lejana a una celda libre cualquiera (al azar, así es
+        # probable que caiga en la región más grande)
+        inicial = self._bfs(random.Random(len(libres)).choice(libres))
+        punto = max(libres, key=lambda i: inicial[i] if inicial[i] != _INALCANZABLE else -1)
+        puntos, distancias = [], []
+        cercania = array('I', [_INALCANZABLE]) * len(celdas)
+        while len(puntos) < cantidad:
+            distancia = self._bfs(punto)
+            puntos.append(punto)
+            distancias.append(distancia)
+            for i in libres:
+                if distancia[i] < cercania[i]:
+                    cercania[i] = distancia[i]
+            candidatos = [i for i in libres if cercania[i] != _INALCANZABLE]
+            punto = max(candidatos, key=cercania.__getitem__)
+            if cercania[punto] == 0:
+                break  # todas las celdas alcanzables ya son puntos de referencia
+        return puntos, distancias
+
+    def heuristica(self, destino):
+        # Devuelve h(indice) para A* hacia `destino`, o None si algún punto de referencia
+        # ya prueba que la celda está en otra región (distancia infinita).
+        tablas = [(tabla, tabla[destino]) for tabla in self.distancias]
+
+        def h(indice):
+            mejor = 0
+            for tabla, hasta_destino in tablas:
+                d = tabla[indice]
+                if (d == _INALCANZABLE) != (hasta_destino == _INALCANZABLE):
+                    return None
+                if d != _INALCANZABLE:
+                    diferencia = d - hasta_destino if d > hasta_destino else hasta_destino - d
+                    if diferencia > mejor:
+                        mejor = diferencia
+            return mejor
+        return h
+
+    def escribir(self, f):
+        mapa = self.mapa
+        f.write(_CABECERA_REFERENCIAS.pack(MAGIA_REFERENCIAS, VERSION_FORMATO, int(self.permitir_agua),
+                                           mapa.filas, mapa.columnas, len(self.puntos), zlib.crc32(mapa.celdas)))
+        for tabla in [array('I', self.puntos)] + self.distancias:
+            if sys.byteorder == 'big':
+                tabla = array('I', tabla)
+                tabla.byteswap()
+            tabla.tofile(f)
+
+    @staticmethod
+    def leer(f, mapa, suma):
+        # Lee la siguiente sección: False al final del archivo, None si no corresponde a
+        # este mapa (se salta) y si no, los PuntosDeReferencia
+        cabecera = f.read(_CABECERA_REFERENCIAS.size)
+        if len(cabecera) < _CABECERA_REFERENCIAS.size:
+            return False
+        magia, version, permitir_agua, filas, columnas, cantidad, crc = _CABECERA_REFERENCIAS.unpack(cabecera)
+        if magia != MAGIA_REFERENCIAS or version != VERSION_FORMATO:
+            raise ValueError("Archivo de puntos de referencia inválido")
+        if (filas, columnas, crc) != (mapa.filas, mapa.columnas, suma):
+            # Sección de otro mapa: se salta sin leer sus tablas
+            f.seek(4 * cantidad * (1 + filas * columnas), os.SEEK_CUR)
+            return None
+        tablas = []
+        for tamano in [cantidad] + [filas * columnas] * cantidad:
+            tabla = array('I')
+            tabla.fromfile(f, tamano)
+            if sys.byteorder == 'big':
+                tabla.byteswap()
+            tablas.append(tabla)
+        return PuntosDeReferencia(mapa, cantidad, bool(permitir_agua), list(tablas[0]), tablas[1:])
+
+
+# ---------------------------
+# CLASE PLANIFICADOR INCREMENTAL
+# ---------------------------
+INFINITO = float('inf')
+
+
+class PlanificadorIncremental:
+    # LPA* (Lifelong Planning A*) para un par inicio/destino fijo. Guarda g y rhs entre
+    # llamadas; cuando se editan celdas sólo se recalculan esas y sus vecinas, y la
+    # búsqueda repara la parte de la ruta afectada en lugar de empezar de cero.
+    def __init__(self, mapa, inicio, destino, permitir_agua=False):
+        self.mapa = mapa
+        self.inicio = inicio
+        self.destino = destino
+        self.permitir_agua = permitir_agua
+        self.version = mapa.version
+        self.g = {}
+        self.rhs = {inicio: 0}
+        self.abiertos = []
+        self.en_cola = {}  # celda -> clave vigente; las demás entradas del heap son viejas
+        self._encolar(inicio)
+
+    def _clave(self, celda):
+        # Clave clásica de LPA*: (min(g, rhs) + h, min(g, rhs)). El desempate por g chica
+        # hace que la primera búsqueda expanda más que a_estrella, pero deja g exactas en
+        # una zona amplia y las reparaciones posteriores quedan locales.
+        m = min(self.g.get(celda, INFINITO), self.rhs.get(celda, INFINITO))
+        return (m + abs(celda[0]-self.destino[0]) + abs(celda[1]-self.destino[1]), m)
+
+    def _encolar(self, celda):
+        clave = self._clave(celda)
+        self.en_cola[celda] = clave
+        heapq.heappush(self.abiertos, (clave, celda))
+
+    def _vecinos(self, celda):
+        f, c = celda
+        for df, dc in MOVIMIENTOS:
+            if self.mapa.dentro_de_limites(f+df, c+dc):
+                yield (f+df, c+dc)
+
+    def _actualizar(self, celda):
+        if celda != self.inicio:
+            if self.mapa.es_transitable(*celda, self.permitir_agua):
+                g = self.g
+                rhs = min((g.get(v, INFINITO) for v in self._vecinos(celda)
+                           if self.mapa.es_transitable(*v, self.permitir_agua)), default=INFINITO) + 1
+            else:
+                rhs = INFINITO
+            self.rhs[celda] = rhs
+        if self.g.get(celda, INFINITO) != self.rhs.get(celda, INFINITO):
+            self._encolar(celda)
+        else:
+            self.en_cola.pop(celda, None)
+
+    def aplicar_cambios(self, indices):
+        columnas = self.mapa.columnas
+        for indice in set(indices):
+            celda = divmod(indice, columnas)
+            self._actualizar(celda)
+            for vecino in self._vecinos(celda):
+                self._actualizar(vecino)
+        self.version = self.mapa.version
+
+    def _calcular(self):
+        abiertos, en_cola, destino = self.abiertos, self.en_cola, self.destino
+        while abiertos:
+            clave, celda = abiertos[0]
+            if en_cola.get(celda) != clave:
+                heapq.heappop(abiertos)
+                continue
+            if clave >= self._clave(destino) and self.rhs.get(destino, INFINITO) == self.g.get(destino, INFINITO):
+                break
+            heapq.heappop(abiertos)
+            del en_cola[celda]
+            if self.g.get(celda, INFINITO) > self.rhs[celda]:
+                self.g[celda] = self.rhs[celda]
+            else:
+                self.g[celda] = INFINITO
+                self._actualizar(celda)
+            for vecino in self._vecinos(celda):
+                self._actualizar(vecino)
+
+    def ruta(self):
+        self._calcular()
+        g = self.g
+        if g.get(self.destino, INFINITO) == INFINITO:
+            return None
+        # Desde el destino se retrocede siempre al vecino transitable de menor g; el orden
+        # de MOVIMIENTOS desempata, así la ruta no depende del orden en que se repararon.
+        ruta = [self.destino]
+        actual = self.destino
+        while actual != self.inicio:
+            actual = min((v for v in self._vecinos(actual) if self.mapa.es_transitable(*v, self.permitir_agua)),
+                         key=lambda v: g.get(v, INFINITO))
+            ruta.append(actual)
+        ruta.reverse()
+        return ruta
+
+
+# ---------------------------
+# CLASE GRAFO JERARQUICO
+# ---------------------------
+TAM_CLUSTER = 16
+
+
+class GrafoJerarquico:
+    # HPA*: el mapa se parte en clusters de tam x tam celdas. En cada borde entre dos
+    # clusters, cada tramo libre a ambos lados aporta una entrada (dos si es largo); las
+    # celdas de esas entradas son los nodos del grafo abstracto. Dentro de cada cluster se
+    # precalcula la distancia entre sus nodos. Una consulta busca primero en ese grafo
+    # chico y después refina sólo los clusters por los que pasa la ruta.
+    # Los clusters se arman a medida que una consulta los toca (_asegurar): construir sólo
+    # reinicia las tablas, así el costo de un mapa grande se paga en las zonas que se usan.
+    # Las rutas son casi óptimas: pueden salir algo más largas que las de bfs.
+    def __init__(self, mapa, permitir_agua=False, tam_cluster=TAM_CLUSTER):
+        self.mapa = mapa
+        self.permitir_agua = permitir_agua
+        self.tam = tam_cluster
+        self.transitable = _tabla_transitable(permitir_agua)
+        self.construir()
+
+    def construir(self):
+        mapa, k = self.mapa, self.tam
+        self.version = mapa.version
+        self.clusters_filas = -(-mapa.filas // k)
+        self.clusters_columnas = -(-mapa.columnas // k)
+        # Sólo lo ya armado: los bordes de los clusters tocados y esos clusters
+        self.bordes = {}                  # clave de borde -> [(celda, celda del otro lado)]
+        self.enlaces = {}                 # nodo -> nodos vecinos al otro lado de un borde
+        self.nodos = {}                   # cluster -> nodos del cluster
+        self.aristas = {}                 # cluster -> {nodo: [(nodo, distancia)]}
+
+    def _asegurar(self, cluster):
+        # Arma el cluster (sus cuatro bordes y las distancias entre sus nodos) la primera
+        # vez que se lo necesita; devuelve sus aristas
+        aristas = self.aristas.get(cluster)
+        if aristas is None:
+            for clave in self._bordes_de(cluster):
+                if clave not in self.bordes:
+                    self._construir_borde(clave)
+            self._construir_cluster(cluster)
+            aristas = self.aristas[cluster]
+        return aristas
+
+    def actualizar(self, indices):
+        # Sólo se rehacen los bordes que tocan las celdas editadas, el cluster de cada
+        # celda y los clusters vecinos cuyo conjunto de nodos cambió por esos bordes. Lo
+        # que todavía no se armó no se toca: se armará con el mapa ya editado.
+        k, columnas = self.tam, self.mapa.columnas
+        clusters, bordes = set(), set()
+        for indice in set(indices):
+            f, c = divmod(indice, columnas)
+            cf, cc = f // k, c // k
+            clusters.add((cf, cc))
+            if f % k == k - 1 and cf + 1 < self.clusters_filas:
+                bordes.add(('h', cf, cc))
+            if f % k == 0 and cf > 0:
+                bordes.add(('h', cf - 1, cc))
+            if c % k == k - 1 and cc + 1 < self.clusters_columnas:
+                bordes.add(('v', cf, cc))
+            if c % k == 0 and cc > 0:
+                bordes.add(('v', cf, cc - 1))
+        for clave in bordes:
+            if clave not in self.bordes:
+                continue
+            self._construir_borde(clave)
+            for cluster in self._clusters_del_borde(clave):
+                if cluster in self.nodos and cluster not in clusters and self._nodos_de(cluster) != self.nodos[cluster]:
+                    clusters.add(cluster)
+        for cluster in clusters:
+            if cluster in self.nodos:
+                self._construir_cluster(cluster)
+        self.version = self.mapa.version
+
+    def _libre(self, f, c):
+        return self.transitable[self.mapa.celdas[f*self.mapa.columnas + c]]
+
+    def _cluster(self, celda):
+        return (celda[0] // self.tam, celda[1] // self.tam)
+
+    @staticmethod
+    def _clusters_del_borde(clave):
+        tipo, cf, cc = clave
+        return ((cf, cc), (cf + 1, cc)) if tipo == 'h' else ((cf, cc), (cf, cc + 1))
+
+    def _bordes_de(self, cluster):
+        cf, cc = cluster
+        claves = []
+        if cf > 0:
+            claves.append(('h', cf - 1, cc))
+        if cf + 1 < self.clusters_filas:
+            claves.append(('h', cf, cc))
+        if cc > 0:
+            claves.append(('v', cf, cc - 1))
+        if cc + 1 < self.clusters_columnas:
+            claves.append(('v', cf, cc))
+        return claves
+
+    def _construir_borde(self, clave):
+        for a, b in self.bordes.get(clave, ()):
+            self.enlaces[a].discard(b)
+            self.enlaces[b].discard(a)
+        tipo, cf, cc = clave
+        k = self.tam
+        if tipo == 'h':
+            f = (cf + 1) * k - 1
+            lado = [(f, c) for c in range(cc * k, min((cc + 1) * k, self.mapa.columnas))]
+            df, dc = 1, 0
+        else:
+            c = (cc + 1) * k - 1
+            lado = [(f, c) for f in range(cf * k, min((cf + 1) * k, self.mapa.filas))]
+            df, dc = 0, 1
+
+        pares, tramo = [], []
+        for celda in lado + [None]:
+            if celda is not None and self._libre(*celda) and self._libre(celda[0] + df, celda[1] + dc):
+                tramo.append(celda)
+                continue
+            if tramo:
+                elegidas = [tramo[len(tramo) // 2]] if len(tramo) < 6 else [tramo[0], tramo[-1]]
+                for a in elegidas:
+                    pares.append((a, (a[0] + df, a[1] + dc)))
+                tramo = []
+        self.bordes[clave] = pares
+        for a, b in pares:
+            self.enlaces.setdefault(a, set()).add(b)
+            self.enlaces.setdefault(b, set()).add(a)
+
+    def _nodos_de(self, cluster):
+        nodos = set()
+        for clave in self._bordes_de(cluster):
+            for a, b in self.bordes[clave]:
+                nodos.add(a if self._cluster(a) == cluster else b)
+        return nodos
+
+    def _construir_cluster(self, cluster):
+        # Las distancias son simétricas: cada BFS completa también la lista de los nodos
+        # anteriores, así el último nodo no necesita su propio BFS. Las adyacencias de las
+        # celdas libres del cluster se arman una vez y sirven para todos esos BFS.
+        nodos = self._nodos_de(cluster)
+        aristas = {nodo: [] for nodo in nodos}
+        pendientes = list(nodos)
+        if len(pendientes) > 1:
+            vecinos, base, ancho = self._adyacencias_locales(cluster)
+            local = {nodo: (nodo[0] - base[0]) * ancho + nodo[1] - base[1] for nodo in nodos}
+            while len(pendientes) > 1:
+                nodo = pendientes.pop()
+                distancia = self._distancias_locales(vecinos, local[nodo])
+                for otro in pendientes:
+                    d = distancia[local[otro]]
+                    if d >= 0:
+                        aristas[nodo].append((otro, d))
+                        aristas[otro].append((nodo, d))
+        self.nodos[cluster] = nodos
+        self.aristas[cluster] = aristas
+
+    def _adyacencias_locales(self, cluster):
+        # vecinos[i]: celdas libres vecinas de la celda i del cluster (índice local
+        # fila*ancho + columna dentro del cluster); las celdas no transitables quedan vacías
+        k = self.tam
+        f0, c0 = cluster[0] * k, cluster[1] * k
+        f1, c1 = min(f0 + k, self.mapa.filas), min(c0 + k, self.mapa.columnas)
+        alto, ancho = f1 - f0, c1 - c0
+        celdas, columnas, transitable = self.mapa.celdas, self.mapa.columnas, self.transitable
+        libre = [transitable[v] for f in range(f0, f1) for v in celdas[f*columnas + c0:f*columnas + c1]]
+        vecinos = [()] * (alto * ancho)
+        for i in range(alto * ancho):
+            if libre[i]:
+                f, c = divmod(i, ancho)
+                vecinos[i] = [j for j, dentro in ((i + ancho, f + 1 < alto), (i - ancho, f > 0),
+                                                  (i + 1, c + 1 < ancho), (i - 1, c > 0)) if dentro and libre[j]]
+        return vecinos, (f0, c0), ancho
+
+    @staticmethod
+    def _distancias_locales(vecinos, origen):
+        # BFS por capas sobre las adyacencias del cluster; -1 = inalcanzable
+        distancia = [-1] * len(vecinos)
+        distancia[origen] = 0
+        capa, d = [origen], 0
+        while capa:
+            d += 1
+            siguiente = []
+            for actual in capa:
+                for vecino in vecinos[actual]:
+                    if distancia[vecino] < 0:
+                        distancia[vecino] = d
+                        siguiente.append(vecino)
+            capa = siguiente
+        return distancia
+
+    def _bfs_local(self, origen, cluster, objetivo=None):
+        # BFS que no sale del cluster
+        k = self.tam
+        f0, c0 = cluster[0] * k, cluster[1] * k
+        f1, c1 = min(f0 + k, self.mapa.filas), min(c0 + k, self.mapa.columnas)
+        celdas, columnas, transitable = self.mapa.celdas, self.mapa.columnas, self.transitable
+        distancia = {origen: 0}
+        previo = {origen: None}
+        cola = deque([origen])
+        while cola:
+            actual = cola.popleft()
+            if actual == objetivo:
+                break
+            f, c = actual
+            siguiente = distancia[actual] + 1
+            for df, dc in MOVIMIENTOS:
+                nf, nc = f + df, c + dc
+                if f0 <= nf < f1 and c0 <= nc < c1 and transitable[celdas[nf*columnas + nc]]:
+                    vecino = (nf, nc)
+                    if vecino not in distancia:
+                        distancia[vecino] = siguiente
+                        previo[vecino] = actual
+                        cola.append(vecino)
+        return distancia, previo
+
+    def ruta(self, inicio, destino):
+        if inicio == destino:
+            return [inicio]
+        cluster_inicio, cluster_destino = self._cluster(inicio), self._cluster(destino)
+
+        # Conexiones temporales de inicio y destino con los nodos de su cluster
+        self._asegurar(cluster_inicio)
+        self._asegurar(cluster_destino)
+        distancia_inicio, previo_inicio = self._bfs_local(inicio, cluster_inicio)
+        salidas = [(n, distancia_inicio[n]) for n in self.nodos[cluster_inicio] if n in distancia_inicio and n != inicio]
+        distancia_destino, _ = self._bfs_local(destino, cluster_destino)
+        llegadas = {n: distancia_destino[n] for n in self.nodos[cluster_destino] if n in distancia_destino}
+
+        local = None
+        if cluster_inicio == cluster_destino and destino in distancia_inicio:
+            local = distancia_inicio[destino]
+
+        fd, cd = destino
+        costo = {inicio: 0}
+        previo = {inicio: None}
+        abiertos = [(abs(inicio[0] - fd) + abs(inicio[1] - cd), 0, inicio)]
+        while abiertos:
+            prioridad, g, nodo = heapq.heappop(abiertos)
+            if nodo == destino or (local is not None and prioridad >= local):
+                break
+            if g > costo[nodo]:
+                continue
+            vecinos = list(salidas) if nodo == inicio else list(self._asegurar(self._cluster(nodo)).get(nodo, ()))
+            vecinos.extend((otro, 1) for otro in self.enlaces.get(nodo, ()))
+            if nodo in llegadas:
+                vecinos.append((destino, llegadas[nodo]))
+            for otro, paso in vecinos:
+                nuevo = g + paso
+                if nuevo < costo.get(otro, nuevo + 1):
+                    costo[otro] = nuevo
+                    previo[otro] = nodo
+                    heapq.heappush(abiertos, (nuevo + abs(otro[0] - fd) + abs(otro[1] - cd), nuevo, otro))
+
+        if local is not None and local <= costo.get(destino, local):
+            return CalculadoraDeRutas._reconstruir(previo_inicio, destino)
+        if destino not in costo:
+            return None
+
+        # Refinamiento: cada tramo del camino abstracto se completa celda a celda
+        abstracto = CalculadoraDeRutas._reconstruir(previo, destino)
+        ruta = [inicio]
+        for a, b in zip(abstracto, abstracto[1:]):
+            if b in self.enlaces.get(a, ()):
+                ruta.append(b)
+                continue
+            _, previo_local = self._bfs_local(a, self._cluster(a), b)
+            ruta.extend(CalculadoraDeRutas._reconstruir(previo_local, b)[1:])
+        return ruta
+
+
+# ---------------------------
+# CLASE CACHE DE RUTAS
+# ---------------------------
+class CacheRutas:
+    # LRU acotada. Las claves llevan la versión del mapa, así que una entrada de una
+    # versión vieja nunca acierta; al ver una versión nueva se vacía de una vez.
+    def __init__(self, capacidad=1024):
+        self.capacidad = capacidad
+        self.version = None
+        self._entradas = OrderedDict()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def sincronizar(self, version):
+        if version != self.version:
+            if self._entradas:
+                self.invalidaciones += 1
+                self._entradas.clear()
+            self.version = version
+
+    def obtener(self, clave):
+        try:
+            valor = self._entradas[clave]
+        except KeyError:
+            self.fallos += 1
+            return None, False
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return valor, True
+
+    def guardar(self, clave, valor):
+        self._entradas[clave] = valor
+        self._entradas.move_to_end(clave)
+        if len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'capacidad': self.capacidad,
+            'tamano': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'desalojos': self.desalojos,
+            'invalidaciones': self.invalidaciones,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+        }
 
 
 # ---------------------------
 # CLASE CALCULADORA DE RUTAS
 # ---------------------------
+MOVIMIENTOS = [(1,0),(-1,0),(0,1),(0,-1)]
+
+# Nombre del modo -> método de CalculadoraDeRutas que lo implementa
+MODOS_BUSQUEDA = {
+    'bfs': 'bfs',
+    'a_estrella': 'a_estrella',
+    'bidireccional': 'bfs_bidireccional',
+    'jps': 'jps',
+    'incremental': 'lpa_estrella',
+    'jerarquico': 'hpa_estrella',
+    'ponderado': 'dial',
+    'alt': 'alt',
+}
+
+
+# Modos cuyas colas o heaps se cuentan con la instrumentación; los demás sólo registran
+# tiempo y paso por agua
+MODOS_CON_CONTEO = {'bfs', 'a_estrella', 'jps', 'alt'}
+
+
 class CalculadoraDeRutas:
-    def __init__(self, mapa):
+    # Frontera de las búsquedas. Con instrumentación se reemplazan, sólo durante la
+    # consulta medida, por versiones que cuentan (ver instrumentacion.py).
+    _crear_cola = deque
+    _heappush = staticmethod(heapq.heappush)
+    _heappop = staticmethod(heapq.heappop)
+    _medicion = None
+
+    def __init__(self, mapa, modo='bfs', tam_cache=1024, usar_componentes=True, tam_cluster=TAM_CLUSTER,
+                 instrumentacion=None):
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo}")
         self.mapa = mapa
+        self.modo = modo
+        # Con el índice de componentes, los pares en regiones distintas se descartan sin
+        # buscar; cuesta 4 bytes por celda y por tipo de conectividad.
+        self.usar_componentes = usar_componentes
+        self._incrementales = {}  # permitir_agua -> PlanificadorIncremental del modo 'incremental'
+        self._jerarquicos = {}    # permitir_agua -> GrafoJerarquico del modo 'jerarquico'
+        self._mascaras_jps = {}   # permitir_agua -> (clave del mapa, máscaras por fila) del modo 'jps'
+        self._nucleo = None       # NucleoBFS de bfs y de la mejor ruta, con búferes del tamaño del mapa
+        self.tam_cluster = tam_cluster
+        # tam_cache=0 desactiva la caché
+        self.cache = CacheRutas(tam_cache) if tam_cache else None
+        # Sumidero de registros por consulta (instrumentacion.py); None la desactiva
+        self.instrumentacion = instrumentacion
+
+    def _consultar_cache(self, clave):
+        if self.cache is None:
+            return None, False
+        self.cache.sincronizar(self.mapa.version)
+        return self.cache.obtener(clave + (self.mapa.version,))
+
+    def _guardar_en_cache(self, clave, valor):
+        if self.cache is not None:
+            self.cache.guardar(clave + (self.mapa.version,), valor)
+
+    def _clave_modo(self, modo):
+        # El modo va en la clave: cada motor puede dar una ruta distinta para el mismo par.
+        # 'ponderado' depende además de los costes; fijar_costos ya renueva la versión, pero
+        # mapa.costos también puede reasignarse directamente (p. ej. en los trabajadores).
+        # usar_componentes y tam_cluster son atributos que se pueden cambiar con la
+        # calculadora en uso, así que también van en la clave.
+        modo = modo or self.modo
+        motor = MODOS_BUSQUEDA.get(modo)
+        if motor == 'dial':
+            return modo, self.usar_componentes, tuple(sorted(self.mapa.costos.items()))
+        if motor == 'hpa_estrella':
+            return modo, self.usar_componentes, self.tam_cluster
+        return modo, self.usar_componentes
+
+    def _motor(self, modo):
+        modo = modo or self.modo
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo}")
+        return getattr(self, MODOS_BUSQUEDA[modo])
+
+    def _medir(self, operacion, metodo, inicio, destino, *argumentos, modo=None, permitir_agua=None):
+        modo = modo or self.modo
+        datos = {'operacion': operacion, 'modo': modo, 'inicio': inicio, 'destino': destino}
+        if permitir_agua is not None:
+            datos['paso_agua'] = permitir_agua
+        if modo not in MODOS_CON_CONTEO:
+            datos['expandidos'] = datos['frontera_max'] = None
+
+        def buscar(medicion):
+            self._medicion = medicion
+            self._crear_cola = medicion.cola
+            self._heappush, self._heappop = medicion.heappush, medicion.heappop
+            try:
+                return metodo(inicio, destino, *argumentos)
+            finally:
+                del self._medicion, self._crear_cola, self._heappush, self._heappop
+        return medir_consulta(self.instrumentacion, datos, buscar)
+
+    def buscar(self, inicio, destino, permitir_agua=False, modo=None):
+        if self.instrumentacion is not None and self._medicion is None:
+            return self._medir('buscar', self.buscar, inicio, destino, permitir_agua, modo,
+                               modo=modo, permitir_agua=permitir_agua)
+        motor = self._motor(modo)
+        clave = (inicio, destino, permitir_agua, self._clave_modo(modo))
+        ruta, acierto = self._consultar_cache(clave)
+        if acierto:
+            if self._medicion is not None:
+                self._medicion.acierto_cache = True
+            return list(ruta) if ruta else None
+        ruta = motor(inicio, destino, permitir_agua)
+        self._guardar_en_cache(clave, tuple(ruta) if ruta else None)
+        return ruta
+
+    def _extremos_validos(self, inicio, destino, permitir_agua):
+        if not (self.mapa.dentro_de_limites(*inicio) and self.mapa.dentro_de_limites(*destino)):
+            return False
+        return self.mapa.es_transitable(*inicio, permitir_agua) and self.mapa.es_transitable(*destino, permitir_agua)
 
     def bfs(self, inicio, destino, permitir_agua=False):
         if not (self.mapa.dentro_de_limites(*inicio) and self.mapa.dentro_de_limites(*destino)):
@@ -118,45 +1246,639 @@ class CalculadoraDeRutas:
         if not self.mapa.es_transitable(*inicio, permitir_agua) or not self.mapa.es_transitable(*destino, permitir_agua):
             return None
 
-        visitado = [[False]*self.mapa.columnas for _ in range(self.mapa.filas)]
-        previo = [[None]*self.mapa.columnas for _ in range(self.mapa.filas)]
-        cola = deque([inicio])
-        visitado[inicio[0]][inicio[1]] = True
+        columnas = self.mapa.columnas
+        return self._nucleo_bfs().buscar(self.mapa.celdas, _tabla_transitable(permitir_agua),
+                                         inicio[0]*columnas + inicio[1], destino[0]*columnas + destino[1],
+                                         self._crear_cola)
 
-        movimientos = [(1,0),(-1,0),(0,1),(0,-1)]
+    def _nucleo_bfs(self):
+        # Índices planos y búferes reutilizados (nucleo_bfs.py); se recrean si cambia el tamaño
+        mapa = self.mapa
+        if self._nucleo is None or (self._nucleo.filas, self._nucleo.columnas) != (mapa.filas, mapa.columnas):
+            self._nucleo = NucleoBFS(mapa.filas, mapa.columnas)
+        return self._nucleo
 
-        while cola:
-            f, c = cola.popleft()
-            if (f, c) == destino:
-                break
-            for df, dc in movimientos:
+    def a_estrella(self, inicio, destino, permitir_agua=False):
+        # A* con heurística Manhattan: admisible y consistente en una grilla de 4 vecinos
+        # con coste 1, así que la primera vez que se saca el destino la ruta es mínima.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
+            return None
+
+        fd, cd = destino
+        costo = {inicio: 0}
+        previo = {inicio: None}
+        abiertos = [(abs(inicio[0]-fd) + abs(inicio[1]-cd), 0, inicio)]
+        heappush, heappop = self._heappush, self._heappop
+
+        while abiertos:
+            _, menos_g, actual = heappop(abiertos)
+            g = -menos_g
+            if actual == destino:
+                return self._reconstruir(previo, destino)
+            if g > costo[actual]:
+                continue  # entrada vieja del heap
+            f, c = actual
+            for df, dc in MOVIMIENTOS:
                 nf, nc = f+df, c+dc
-                if self.mapa.dentro_de_limites(nf, nc) and not visitado[nf][nc]:
-                    if self.mapa.es_transitable(nf, nc, permitir_agua):
-                        visitado[nf][nc] = True
-                        previo[nf][nc] = (f, c)
-                        cola.append((nf, nc))
+                if self.mapa.dentro_de_limites(nf, nc) and self.mapa.es_transitable(nf, nc, permitir_agua):
+                    vecino = (nf, nc)
+                    nuevo = g + 1
+                    if nuevo < costo.get(vecino, nuevo + 1):
+                        costo[vecino] = nuevo
+                        previo[vecino] = actual
+                        # A igual f se prefiere la de mayor g (más cerca del destino)
+                        heappush(abiertos, (nuevo + abs(nf-fd) + abs(nc-cd), -nuevo, vecino))
+        return None
+
+    def alt(self, inicio, destino, permitir_agua=False):
+        # A* con la cota ALT (ver PuntosDeReferencia) combinada con Manhattan. Si el mapa
+        # todavía no tiene puntos de referencia se preparan acá, una vez por versión.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
+            return None
+        mapa = self.mapa
+        referencias = mapa.referencias(permitir_agua) or mapa.preparar_referencias(permitir_agua=permitir_agua)
+        columnas, celdas = mapa.columnas, mapa.celdas
+        transitable = _tabla_transitable(permitir_agua)
+        origen = inicio[0]*columnas + inicio[1]
+        final = destino[0]*columnas + destino[1]
+        fd, cd = destino
+        cota = referencias.heuristica(final)
+        h = cota(origen)
+        if h is None:
+            return None  # otra región según los puntos de referencia
 
-        if not visitado[destino[0]][destino[1]]:
+        costo = {origen: 0}
+        previo = {origen: None}
+        abiertos = [(max(h, abs(inicio[0]-fd) + abs(inicio[1]-cd)), 0, origen)]
+        heappush, heappop = self._heappush, self._heappop
+        ultimo = len(celdas)
+        while abiertos:
+            _, menos_g, actual = heappop(abiertos)
+            g = -menos_g
+            if actual == final:
+                ruta = []
+                while actual is not None:
+                    ruta.append(divmod(actual, columnas))
+                    actual = previo[actual]
+                ruta.reverse()
+                return ruta
+            if g > costo[actual]:
+                continue  # entrada vieja del heap
+            c = actual % columnas
+            for vecino in (actual - columnas, actual + columnas,
+                           actual - 1 if c else -1, actual + 1 if c + 1 < columnas else -1):
+                if not (0 <= vecino < ultimo and transitable[celdas[vecino]]):
+                    continue
+                nuevo = g + 1
+                if nuevo < costo.get(vecino, nuevo + 1):
+                    h = cota(vecino)
+                    if h is None:
+                        continue
+                    nf, nc = divmod(vecino, columnas)
+                    costo[vecino] = nuevo
+                    previo[vecino] = actual
+                    heappush(abiertos, (nuevo + max(h, abs(nf-fd) + abs(nc-cd)), -nuevo, vecino))
+        return None
+
+    def jps(self, inicio, destino, permitir_agua=False):
+        # Jump Point Search adaptado a 4 vecinos. Entre caminos de igual longitud se prefiere
+        # el que hace los movimientos verticales antes que los horizontales; así:
+        #  - tras un paso vertical se sigue en vertical o se gira a cualquier lado;
+        #  - tras un paso horizontal sólo se sigue recto, salvo "vecino forzado": arriba o
+        #    abajo libre cuando esa misma casilla de la columna anterior está bloqueada.
+        # Los saltos recorren tramos rectos sin encolar nada y sólo se detienen en puntos
+        # donde la ruta puede doblar; el A* trabaja sobre esos puntos de salto.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
             return None
+        if inicio == destino:
+            return [inicio]
+
+        filas, columnas, celdas = self.mapa.filas, self.mapa.columnas, self.mapa.celdas
+        transitable = _tabla_transitable(permitir_agua)
+        libres, forzadas_der, forzadas_izq = self._mascaras(permitir_agua)
+        fd, cd = destino
+
+        def libre(f, c):
+            return 0 <= f < filas and 0 <= c < columnas and transitable[celdas[f*columnas + c]]
+
+        def saltar_horizontal(f, c, dc):
+            # Primera columna después de c, hacia dc, con vecino forzado o con el destino,
+            # si está antes de la primera pared; se busca con operaciones de bits sobre la fila
+            if dc > 0:
+                resto = ~libres[f] >> (c + 1)  # ~ deja en 1 todo lo que está fuera del mapa
+                pared = c + (resto & -resto).bit_length()
+                resto = forzadas_der[f] >> (c + 1)
+                punto = c + (resto & -resto).bit_length() if resto else pared
+                if f == fd and c < cd < punto:
+                    punto = cd
+                return punto if punto < pared else None
+            antes = (1 << c) - 1
+            pared = (~libres[f] & antes).bit_length() - 1  # -1 es el borde del mapa
+            punto = (forzadas_izq[f] & antes).bit_length() - 1
+            if f == fd and punto < cd < c:
+                punto = cd
+            return punto if punto > pared else None
+
+        def saltar_vertical(f, c, df):
+            # Se detiene donde girar tiene sentido: si un salto horizontal desde ahí encuentra
+            # algo. Con las máscaras cada prueba cuesta lo mismo que unas pocas operaciones.
+            while True:
+                f += df
+                if not libre(f, c):
+                    return None
+                if f == fd and c == cd:
+                    return f
+                if saltar_horizontal(f, c, 1) is not None or saltar_horizontal(f, c, -1) is not None:
+                    return f
+
+        costo = {inicio: 0}
+        previo = {inicio: None}
+        abiertos = [(abs(inicio[0]-fd) + abs(inicio[1]-cd), 0, inicio, None)]
+        heappush, heappop = self._heappush, self._heappop
+        while abiertos:
+            _, menos_g, actual, direccion = heappop(abiertos)
+            g = -menos_g
+            if actual == destino:
+                return self._expandir_saltos(previo, destino)
+            if g > costo[actual]:
+                continue
+            f, c = actual
+            if direccion is None:
+                direcciones = MOVIMIENTOS
+            elif direccion[1] == 0:
+                direcciones = (direccion, (0, 1), (0, -1))
+            else:
+                dc = direccion[1]
+                direcciones = [direccion] + [(df, 0) for df in (1, -1) if libre(f+df, c) and not libre(f+df, c-dc)]
+
+            for df, dc in direcciones:
+                if df:
+                    salto = saltar_vertical(f, c, df)
+                    punto = (salto, c) if salto is not None else None
+                else:
+                    salto = saltar_horizontal(f, c, dc)
+                    punto = (f, salto) if salto is not None else None
+                if punto is None:
+                    continue
+                nuevo = g + abs(punto[0]-f) + abs(punto[1]-c)
+                if nuevo < costo.get(punto, nuevo + 1):
+                    costo[punto] = nuevo
+                    previo[punto] = actual
+                    heappush(abiertos, (nuevo + abs(punto[0]-fd) + abs(punto[1]-cd), -nuevo, punto, (df, dc)))
+        return None
+
+    def _mascaras(self, permitir_agua):
+        # Por fila, enteros usados como máscaras de bits (bit c = columna c): celdas libres y
+        # celdas con vecino forzado al avanzar hacia la derecha o hacia la izquierda. Se
+        # arman una vez por versión del mapa, con una conversión en C por fila.
+        mapa = self.mapa
+        clave = (mapa.version, mapa.filas, mapa.columnas)
+        guardado = self._mascaras_jps.get(permitir_agua)
+        if guardado is not None and guardado[0] == clave:
+            return guardado[1]
+
+        filas, columnas, celdas = mapa.filas, mapa.columnas, mapa.celdas
+        a_digitos = bytes(b'01'[v] for v in _tabla_transitable(permitir_agua))
+        # int() lee el bit más significativo primero: la fila se invierte para que c sea el bit c
+        libres = [int(bytes(celdas[f*columnas:(f+1)*columnas]).translate(a_digitos)[::-1], 2) if columnas else 0
+                  for f in range(filas)]
+        forzadas_der, forzadas_izq = [], []
+        for f, fila in enumerate(libres):
+            arriba = libres[f-1] if f else 0
+            abajo = libres[f+1] if f + 1 < filas else 0
+            # Forzada hacia la derecha en c: arriba (o abajo) libre en c pero no en c-1
+            forzadas_der.append(fila & ((arriba & ~(arriba << 1)) | (abajo & ~(abajo << 1))))
+            forzadas_izq.append(fila & ((arriba & ~(arriba >> 1)) | (abajo & ~(abajo >> 1))))
+        mascaras = libres, forzadas_der, forzadas_izq
+        self._mascaras_jps[permitir_agua] = (clave, mascaras)
+        return mascaras
+
+    def _expandir_saltos(self, previo, destino):
+        # Rellena los tramos rectos entre puntos de salto para devolver la ruta celda a celda
+        puntos = self._reconstruir(previo, destino)
+        ruta = [puntos[0]]
+        for (f0, c0), (f1, c1) in zip(puntos, puntos[1:]):
+            df = (f1 > f0) - (f1 < f0)
+            dc = (c1 > c0) - (c1 < c0)
+            f, c = f0, c0
+            while (f, c) != (f1, c1):
+                f, c = f+df, c+dc
+                ruta.append((f, c))
+        return ruta
+
+    def dial(self, inicio, destino, permitir_agua=False):
+        # Modo 'ponderado': ruta de menor coste según mapa.costos (sin agua si no se permite)
+        ruta, _ = self._dial(inicio, destino, _tabla_costos(self.mapa.costos, permitir_agua))
+        return ruta
+
+    def ruta_ponderada(self, inicio, destino, costos=None):
+        # Una sola búsqueda con agua permitida pero con su coste: devuelve (ruta, coste) o
+        # (None, None). Sin `costos` usa los del mapa y pasa por la caché.
+        if costos is not None:
+            return self._dial(inicio, destino, _tabla_costos(costos))
+        clave = (inicio, destino, 'ponderada', tuple(sorted(self.mapa.costos.items())))
+        resultado, acierto = self._consultar_cache(clave)
+        if acierto:
+            ruta, costo = resultado
+            return (list(ruta), costo) if ruta else (None, None)
+        ruta, costo = self._dial(inicio, destino, _tabla_costos(self.mapa.costos))
+        self._guardar_en_cache(clave, (tuple(ruta), costo) if ruta else (None, None))
+        return ruta, costo
+
+    def _dial(self, inicio, destino, tabla):
+        # A* con cola de cubetas (Dial): los costes son enteros chicos, así que la frontera
+        # es un anillo de listas indexado por f = g + h. La heurística es Manhattan por el
+        # coste mínimo, consistente: f nunca baja y sube a lo sumo costo_max + costo_min
+        # por arista, lo que acota el anillo a ese ancho. Sacar y meter es O(1).
+        mapa = self.mapa
+        if not (mapa.dentro_de_limites(*inicio) and mapa.dentro_de_limites(*destino)):
+            return None, None
+        filas, columnas, celdas = mapa.filas, mapa.columnas, mapa.celdas
+        origen = inicio[0]*columnas + inicio[1]
+        final = destino[0]*columnas + destino[1]
+        if not tabla[celdas[origen]] or not tabla[celdas[final]]:
+            return None, None
+
+        minimo = min(c for c in tabla if c)
+        ancho = max(tabla) + minimo + 1
+        fd, cd = destino
+        cubetas = [[] for _ in range(ancho)]
+        costo = {origen: 0}
+        previo = {origen: None}
+        cerrados = set()
+        f_actual = (abs(inicio[0]-fd) + abs(inicio[1]-cd)) * minimo
+        cubetas[f_actual % ancho].append(origen)
+        pendientes = 1
+
+        while pendientes:
+            cubeta = cubetas[f_actual % ancho]
+            while not cubeta:
+                f_actual += 1
+                cubeta = cubetas[f_actual % ancho]
+            # LIFO dentro de la cubeta: a igual f sale la última encolada, que suele
+            # ser la de mayor g
+            actual = cubeta.pop()
+            pendientes -= 1
+            if actual in cerrados:
+                continue  # entrada vieja: la celda ya salió con un coste menor
+            if actual == final:
+                ruta = []
+                while actual is not None:
+                    ruta.append(divmod(actual, columnas))
+                    actual = previo[actual]
+                ruta.reverse()
+                return ruta, costo[final]
+            cerrados.add(actual)
+            g = costo[actual]
+            f, c = divmod(actual, columnas)
+            for vecino, nf, nc in ((actual+columnas, f+1, c), (actual-columnas, f-1, c),
+                                   (actual+1, f, c+1), (actual-1, f, c-1)):
+                if not (0 <= nf < filas and 0 <= nc < columnas):
+                    continue
+                paso = tabla[celdas[vecino]]
+                if not paso:
+                    continue
+                nuevo = g + paso
+                if nuevo < costo.get(vecino, nuevo + 1):
+                    costo[vecino] = nuevo
+                    previo[vecino] = actual
+                    cubetas[(nuevo + (abs(nf-fd) + abs(nc-cd)) * minimo) % ancho].append(vecino)
+                    pendientes += 1
+        return None, None
+
+    def lpa_estrella(self, inicio, destino, permitir_agua=False):
+        # Modo incremental: reutiliza el planificador del último par consultado si el mapa
+        # sólo cambió por ediciones de celdas sueltas desde entonces.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
+            return None
+        plan = self._incrementales.get(permitir_agua)
+        if plan is not None and plan.mapa is self.mapa and (plan.inicio, plan.destino) == (inicio, destino):
+            cambios = self.mapa.cambios_desde(plan.version)
+            if cambios is None:
+                plan = None
+            else:
+                plan.aplicar_cambios(cambios)
+        else:
+            plan = None
+        if plan is None:
+            plan = PlanificadorIncremental(self.mapa, inicio, destino, permitir_agua)
+            self._incrementales[permitir_agua] = plan
+        return plan.ruta()
+
+    def hpa_estrella(self, inicio, destino, permitir_agua=False):
+        # Modo jerárquico: mantiene un GrafoJerarquico por tipo de conectividad y lo
+        # actualiza sólo en los clusters tocados por las ediciones desde la última consulta.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
+            return None
+        if self.usar_componentes and not self.mapa.mismo_componente(inicio, destino, permitir_agua):
+            # Sin esto, un par sin ruta recorrería (y armaría) toda la región del inicio
+            return None
+        grafo = self._jerarquicos.get(permitir_agua)
+        if grafo is None or grafo.mapa is not self.mapa or grafo.tam != self.tam_cluster:
+            grafo = GrafoJerarquico(self.mapa, permitir_agua, self.tam_cluster)
+            self._jerarquicos[permitir_agua] = grafo
+        elif grafo.version != self.mapa.version:
+            cambios = self.mapa.cambios_desde(grafo.version)
+            if cambios is None:
+                grafo.construir()
+            else:
+                grafo.actualizar(cambios)
+        return grafo.ruta(inicio, destino)
+
+    def bfs_bidireccional(self, inicio, destino, permitir_agua=False):
+        # BFS desde ambos extremos, expandiendo siempre una capa completa del frente más
+        # chico. Cuando una capa toca al otro lado se elige el mejor cruce de esa capa.
+        if not self._extremos_validos(inicio, destino, permitir_agua):
+            return None
+        if inicio == destino:
+            return [inicio]
+
+        dist_ini, previo_ini = {inicio: 0}, {inicio: None}
+        dist_fin, previo_fin = {destino: 0}, {destino: None}
+        frente_ini, frente_fin = [inicio], [destino]
+
+        while frente_ini and frente_fin:
+            if len(frente_ini) <= len(frente_fin):
+                frente_ini, cruce = self._expandir_capa(frente_ini, dist_ini, previo_ini, dist_fin, permitir_agua)
+                if cruce:
+                    lado_ini, lado_fin = cruce
+                    break
+            else:
+                frente_fin, cruce = self._expandir_capa(frente_fin, dist_fin, previo_fin, dist_ini, permitir_agua)
+                if cruce:
+                    lado_fin, lado_ini = cruce
+                    break
+        else:
+            return None
+
+        ruta = self._reconstruir(previo_ini, lado_ini)
+        actual = lado_fin
+        while actual is not None:
+            ruta.append(actual)
+            actual = previo_fin[actual]
+        return ruta
+
+    def distancias_desde(self, origen, destinos, permitir_agua=False, con_rutas=False):
+        # Un solo BFS desde origen para todos los destinos; se corta en cuanto los alcanzó
+        # a todos. Devuelve {destino: distancia o None} y, con con_rutas, también
+        # {destino: ruta o None}.
+        mapa = self.mapa
+        resultado = {destino: None for destino in destinos}
+        pendientes = set()
+        if mapa.dentro_de_limites(*origen) and mapa.es_transitable(*origen, permitir_agua):
+            for destino in resultado:
+                if not (mapa.dentro_de_limites(*destino) and mapa.es_transitable(*destino, permitir_agua)):
+                    continue
+                if self.usar_componentes and not mapa.mismo_componente(origen, destino, permitir_agua):
+                    continue
+                pendientes.add(destino)
+
+        distancia = {origen: 0}
+        previo = {origen: None}
+        if origen in pendientes:
+            resultado[origen] = 0
+            pendientes.discard(origen)
+        cola = deque([origen])
+        while cola and pendientes:
+            actual = cola.popleft()
+            f, c = actual
+            siguiente = distancia[actual] + 1
+            for df, dc in MOVIMIENTOS:
+                nf, nc = f+df, c+dc
+                if not mapa.dentro_de_limites(nf, nc):
+                    continue
+                vecino = (nf, nc)
+                if vecino in distancia or not mapa.es_transitable(nf, nc, permitir_agua):
+                    continue
+                distancia[vecino] = siguiente
+                previo[vecino] = actual
+                cola.append(vecino)
+                if vecino in pendientes:
+                    resultado[vecino] = siguiente
+                    pendientes.discard(vecino)
+
+        if not con_rutas:
+            return resultado
+        rutas = {destino: self._reconstruir(previo, destino) if d is not None else None
+                 for destino, d in resultado.items()}
+        return resultado, rutas
+
+    def matriz_distancias(self, origenes, destinos, permitir_agua=False, procesos=None):
+        # Una fila por origen, una columna por destino (None = inalcanzable). Los orígenes
+        # se reparten entre procesos que leen el mapa desde memoria compartida.
+        origenes, destinos = list(origenes), list(destinos)
+        procesos = procesos or os.cpu_count() or 1
+        if procesos == 1 or len(origenes) < 2 or not self.mapa.celdas:
+            return [self._fila_distancias(origen, destinos, permitir_agua) for origen in origenes]
+
+        memoria, componentes = self._compartir_mapa((permitir_agua,))
+        try:
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                                     initargs=self._argumentos_trabajador(memoria, componentes, destinos,
+                                                                          permitir_agua)) as ejecutor:
+                bloque = max(1, len(origenes) // (4 * procesos))
+                return list(ejecutor.map(_fila_distancias_trabajador, origenes, chunksize=bloque))
+        finally:
+            memoria.close()
+            memoria.unlink()
+
+    def rutas_en_lote(self, pares, procesos=None, tam_bloque=256, modo=None):
+        # encontrar_mejor_ruta para cada par (inicio, destino), repartido entre procesos.
+        # El mapa se copia una sola vez a memoria compartida y cada proceso lo adjunta al
+        # arrancar; las tareas sólo llevan bloques de pares. Los resultados (ruta, tipo)
+        # salen en el orden de entrada a medida que se completan, con a lo sumo
+        # 2*procesos bloques en vuelo: los pares se consumen de a poco y sirven
+        # iteradores de cualquier tamaño. Las ediciones del mapa hechas mientras se
+        # itera no afectan al lote.
+        motor_modo = modo or self.modo
+        self._motor(motor_modo)  # valida el modo antes de arrancar procesos
+        pares = iter(pares)
+        procesos = procesos or os.cpu_count() or 1
+        if procesos == 1 or not self.mapa.celdas:
+            for inicio, destino in pares:
+                yield self.encontrar_mejor_ruta(inicio, destino, motor_modo)
+            return
+
+        # encontrar_mejor_ruta consulta los componentes con y sin agua
+        memoria, componentes = self._compartir_mapa((False, True))
+        ejecutor = ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador,
+                                       initargs=self._argumentos_trabajador(memoria, componentes, modo=motor_modo))
+        try:
+            en_vuelo = deque()
+            while True:
+                while len(en_vuelo) < 2 * procesos:
+                    bloque = list(itertools.islice(pares, tam_bloque))
+                    if not bloque:
+                        break
+                    en_vuelo.append(ejecutor.submit(_rutas_trabajador, bloque))
+                if not en_vuelo:
+                    break
+                yield from en_vuelo.popleft().result()
+        finally:
+            ejecutor.shutdown(cancel_futures=True)
+            memoria.close()
+            memoria.unlink()
+
+    def _compartir_mapa(self, conectividades):
+        # Con usar_componentes, el índice de cada conectividad se arma una vez aquí y viaja
+        # en el mismo bloque que las celdas: si no, cada trabajador lo rehace entero.
+        return _copiar_a_memoria_compartida(self.mapa, conectividades if self.usar_componentes else ())
+
+    def _argumentos_trabajador(self, memoria, componentes, destinos=None, permitir_agua=False, modo=None):
+        return (memoria.name, self.mapa.filas, self.mapa.columnas, self.mapa.costos, modo or self.modo,
+                self.usar_componentes, self.tam_cluster, componentes, destinos, permitir_agua)
 
+    def _fila_distancias(self, origen, destinos, permitir_agua):
+        distancias = self.distancias_desde(origen, destinos, permitir_agua)
+        return [distancias[destino] for destino in destinos]
+
+    def _expandir_capa(self, frente, dist, previo, dist_otro, permitir_agua):
+        nuevo_frente = []
+        mejor, cruce = None, None
+        for actual in frente:
+            f, c = actual
+            base = dist[actual] + 1
+            for df, dc in MOVIMIENTOS:
+                nf, nc = f+df, c+dc
+                if not self.mapa.dentro_de_limites(nf, nc) or not self.mapa.es_transitable(nf, nc, permitir_agua):
+                    continue
+                vecino = (nf, nc)
+                if vecino in dist_otro:
+                    total = base + dist_otro[vecino]
+                    if mejor is None or total < mejor:
+                        mejor, cruce = total, (actual, vecino)
+                if vecino not in dist:
+                    dist[vecino] = base
+                    previo[vecino] = actual
+                    nuevo_frente.append(vecino)
+        return nuevo_frente, cruce
+
+    @staticmethod
+    def _reconstruir(previo, destino):
         ruta = []
         actual = destino
-        while actual:
+        while actual is not None:
             ruta.append(actual)
-            actual = previo[actual[0]][actual[1]]
+            actual = previo[actual]
         ruta.reverse()
         return ruta
 
-    def encontrar_mejor_ruta(self, inicio, destino):
-        ruta_tierra = self.bfs(inicio, destino, permitir_agua=False)
-        if ruta_tierra:
-            return ruta_tierra, 'tierra'
-        ruta_agua = self.bfs(inicio, destino, permitir_agua=True)
+    def encontrar_mejor_ruta(self, inicio, destino, modo=None):
+        if self.instrumentacion is not None and self._medicion is None:
+            return self._medir('mejor_ruta', self.encontrar_mejor_ruta, inicio, destino, modo, modo=modo)
+        self._motor(modo)  # valida el modo antes de tocar la caché
+        clave = (inicio, destino, 'mejor', self._clave_modo(modo))
+        resultado, acierto = self._consultar_cache(clave)
+        if acierto:
+            if self._medicion is not None:
+                self._medicion.acierto_cache = True
+            ruta, tipo = resultado
+            return (list(ruta), tipo) if ruta else (None, None)
+        ruta, tipo = self._encontrar_mejor_ruta(inicio, destino, modo)
+        self._guardar_en_cache(clave, (tuple(ruta), tipo) if ruta else (None, None))
+        return ruta, tipo
+
+    def _encontrar_mejor_ruta(self, inicio, destino, modo):
+        motor = self._motor(modo)
+        probar_tierra = True
+        if self.usar_componentes:
+            mapa = self.mapa
+            if not (mapa.dentro_de_limites(*inicio) and mapa.dentro_de_limites(*destino)):
+                return None, None
+            # Regiones distintas aun cruzando agua: no hay ruta y no hace falta buscar
+            if not mapa.mismo_componente(inicio, destino, permitir_agua=True):
+                return None, None
+            probar_tierra = mapa.mismo_componente(inicio, destino)
+        if motor == self.bfs:
+            return self.bfs_tierra_luego_agua(inicio, destino, probar_tierra)
+        if probar_tierra:
+            ruta_tierra = motor(inicio, destino, permitir_agua=False)
+            if ruta_tierra:
+                return ruta_tierra, 'tierra'
+        if self._medicion is not None:
+            self._medicion.paso_agua = True
+        ruta_agua = motor(inicio, destino, permitir_agua=True)
         if ruta_agua:
             return ruta_agua, 'agua'
         return None, None
 
+    def bfs_tierra_luego_agua(self, inicio, destino, probar_tierra=True):
+        # Una sola búsqueda para encontrar_mejor_ruta sobre el núcleo de índices planos: un
+        # BFS por tierra que, si no llega, sigue desde el agua que toca su región sin volver
+        # a recorrer la tierra (ver NucleoBFS.tierra_luego_agua).
+        mapa = self.mapa
+        if not (mapa.dentro_de_limites(*inicio) and mapa.dentro_de_limites(*destino)):
+            return None, None
+        columnas = mapa.columnas
+        ruta, tipo = self._nucleo_bfs().tierra_luego_agua(
+            mapa.celdas, _tabla_transitable(False), _tabla_transitable(True), inicio[0]*columnas + inicio[1],
+            destino[0]*columnas + destino[1], probar_tierra, self._crear_cola)
+        if self._medicion is not None and tipo != 'tierra':
+            self._medicion.paso_agua = mapa.es_transitable(*inicio, True) and mapa.es_transitable(*destino, True)
+        return ruta, tipo
+
+
+# ---------------------------
+# TRABAJADORES PARA CONSULTAS EN PARALELO
+# ---------------------------
+# Estado de cada proceso del pool, cargado una vez por _iniciar_trabajador
+_TRABAJADOR = {}
+
+
+def _copiar_a_memoria_compartida(mapa, conectividades=()):
+    # Bloque con las celdas y, por cada conectividad pedida, las etiquetas y el padre de su
+    # índice de componentes (alineados a 4 bytes). Devuelve el bloque y, por conectividad,
+    # (permitir_agua, inicio de etiquetas, inicio de padre, entradas de padre).
+    total = len(mapa.celdas)
+    indices = [(permitir_agua, mapa.indice_componentes(permitir_agua)) for permitir_agua in conectividades]
+    inicio = (total + 3) & ~3
+    componentes = []
+    for permitir_agua, indice in indices:
+        componentes.append((permitir_agua, inicio, inicio + 4*total, len(indice.padre)))
+        inicio += 4*total + 4*len(indice.padre)
+    memoria = shared_memory.SharedMemory(create=True, size=max(inicio, 1))
+    memoria.buf[:total] = mapa.celdas
+    for (_, indice), (_, etiquetas, padre, largo) in zip(indices, componentes):
+        memoria.buf[etiquetas:padre] = memoryview(indice.etiquetas).cast('B')
+        memoria.buf[padre:padre + 4*largo] = memoryview(indice.padre).cast('B')
+    return memoria, tuple(componentes)
+
+
+def _iniciar_trabajador(nombre, filas, columnas, costos, modo, usar_componentes, tam_cluster, componentes, destinos,
+                        permitir_agua):
+    # Adjunta el bloque compartido por nombre: las celdas no se copian ni se serializan
+    memoria = shared_memory.SharedMemory(name=nombre)
+    mapa = Mapa(0, 0)
+    mapa.filas, mapa.columnas, mapa.celdas = filas, columnas, memoria.buf[:filas * columnas]
+    mapa.costos = costos
+    mapa._modificado()
+    # Las etiquetas se leen del bloque (el trabajador no edita el mapa); padre se copia
+    # porque _raiz lo comprime al consultar
+    mapa._componentes = {
+        agua: IndiceComponentes(mapa, agua, memoria.buf[etiquetas:padre].cast('i'),
+                                array('i', bytes(memoria.buf[padre:padre + 4*largo])))
+        for agua, etiquetas, padre, largo in componentes}
+    _TRABAJADOR['memoria'] = memoria  # mantiene el bloque adjuntado mientras viva el proceso
+    _TRABAJADOR['calculadora'] = CalculadoraDeRutas(mapa, modo, tam_cache=0, usar_componentes=usar_componentes,
+                                                    tam_cluster=tam_cluster)
+    _TRABAJADOR['destinos'] = destinos
+    _TRABAJADOR['permitir_agua'] = permitir_agua
+
+
+def _fila_distancias_trabajador(origen):
+    calculadora = _TRABAJADOR['calculadora']
+    return calculadora._fila_distancias(origen, _TRABAJADOR['destinos'], _TRABAJADOR['permitir_agua'])
+
+
+def _rutas_trabajador(pares):
+    calculadora = _TRABAJADOR['calculadora']
+    return [calculadora._encontrar_mejor_ruta(inicio, destino, None) for inicio, destino in pares]
+
+
+def _bloque_obstaculos(semilla, indice, tamano, tabla):
+    # Un bloque de filas de Mapa.generar con su propio generador, derivado de la semilla
+    return random.Random(f"{semilla}-{indice}").randbytes(tamano).translate(tabla)
+
 
 # ---------------------------
 # CLASE INTERFAZ CLI
@@ -169,6 +1891,9 @@ class InterfazCLI:
         self.destino = None
         self.ultima_ruta = None
         self.modo_detallado = False
+        self.ventana = 'auto'
+        self.lote = None  # archivo de salida JSON mientras corre ejecutar_lote
+        self._linea = None
 
     def ejecutar(self):
         print("Calculadora de rutas CLI (OOP). Escribe 'ayuda' para ver comandos.")
@@ -178,114 +1903,279 @@ class InterfazCLI:
             except (KeyboardInterrupt, EOFError):
                 print("\nSaliendo.")
                 break
+            if entrada and not self.ejecutar_comando(entrada):
+                break
 
-            if not entrada:
-                continue
+    def ejecutar_lote(self, lineas, salida=None):
+        # Mismos comandos que 'ayuda', sin dibujar el mapa ni mensajes para humanos. Cada
+        # 'buscar' y cada error escriben una línea JSON en `salida`; las líneas vacías y
+        # las que empiezan con '#' se saltan.
+        salida = salida or sys.stdout
+        self.lote = salida
+        try:
+            for numero, linea in enumerate(lineas, 1):
+                entrada = linea.strip()
+                if not entrada or entrada.startswith('#'):
+                    continue
+                self._linea = numero
+                try:
+                    if not self.ejecutar_comando(entrada):
+                        break
+                except (ValueError, OSError) as error:
+                    self._error(str(error))
+        finally:
+            self.lote = self._linea = None
+            salida.flush()
 
-            partes = entrada.split()
-            comando = partes[0].lower()
+    def cerrar(self):
+        # Al salir: cierra el archivo de 'stats on archivo.jsonl' si quedó abierto
+        if self.calculadora.instrumentacion is not None:
+            self.calculadora.instrumentacion.cerrar()
 
-            if comando in ('salir', 'exit', 'q'):
-                print("Adiós.")
-                break
+    def _decir(self, *texto):
+        if self.lote is None:
+            print(*texto)
+
+    def _dibujar(self, ruta):
+        if self.lote is None:
+            self.mapa.mostrar(ruta, self.inicio, self.destino, self.modo_detallado, self.ventana)
+
+    def _error(self, mensaje):
+        if self.lote is None:
+            print(mensaje)
+        else:
+            self._emitir({'error': mensaje})
+
+    def _emitir(self, registro):
+        self.lote.write(json.dumps(dict({'linea': self._linea}, **registro)) + '\n')
 
-            if comando == 'ayuda':
-                print("""Comandos disponibles:
+    def ejecutar_comando(self, entrada):
+        "Procesa una línea de comando; devuelve False si el comando pide salir"
+        partes = entrada.split()
+        comando = partes[0].lower()
+
+        if comando in ('salir', 'exit', 'q'):
+            self._decir("Adiós.")
+            return False
+
+        if comando == 'ayuda':
+            self._decir("""Comandos disponibles:
  mostrar                       - dibuja el mapa
  inicio f c                    - fija punto de inicio
  destino f c                   - fija punto de destino
  buscar                        - calcula la mejor ruta
+ buscar costo                  - ruta más barata según los costos del terreno
+ costos tierra agua            - fija el costo de pisar camino libre y agua
  agregar f c tipo              - cambia celda
  quitar f c                    - borra obstáculo
  redimensionar f c             - cambia tamaño del mapa
- guardar archivo.txt           - guarda mapa
- cargar archivo.txt            - carga mapa
+ generar f c semilla           - mapa nuevo reproducible, con inicio y destino conectados
+ guardar archivo.txt           - guarda mapa (con extensión .bin, en binario)
+ cargar archivo.txt            - carga mapa (texto o binario, se detecta solo)
  alternar detallado            - alterna símbolos de agua/bloqueo
+ ventana completa|ruta|auto    - parte del mapa a dibujar (o ventana f0 c0 f1 c1)
+ modo nombre                   - elige la búsqueda (bfs, a_estrella, bidireccional, jps, incremental, jerarquico, ponderado, alt)
+                                 jerarquico arma sólo los clusters que tocan las consultas; en mapas
+                                 de 10000x10000 la primera ruta larga tarda más de un minuto
+                                 (ahí conviene a_estrella o alt) y las siguientes son rápidas
+ cache                         - muestra estadísticas de la caché de rutas
+ stats on [archivo.jsonl]      - mide cada búsqueda (en memoria o a un archivo JSON lines)
+ stats off                     - deja de medir
+ stats                         - resumen y últimas búsquedas medidas
  salir                         - salir
 """)
-                continue
+            return True
 
-            if comando == 'mostrar':
-                self.mapa.mostrar(self.ultima_ruta, self.inicio, self.destino, self.modo_detallado)
-                continue
+        if comando == 'mostrar':
+            self._dibujar(self.ultima_ruta)
+            return True
 
-            if comando == 'inicio' and len(partes) >= 3:
-                f, c = int(partes[1]), int(partes[2])
-                if not self.mapa.dentro_de_limites(f, c):
-                    print("Fuera del mapa.")
-                    continue
-                self.inicio = (f, c)
-                print("Inicio fijado en", self.inicio)
-                continue
+        if comando == 'inicio' and len(partes) >= 3:
+            f, c = int(partes[1]), int(partes[2])
+            if not self.mapa.dentro_de_limites(f, c):
+                self._error("Fuera del mapa.")
+                return True
+            self.inicio = (f, c)
+            self._decir("Inicio fijado en", self.inicio)
+            return True
 
-            if comando == 'destino' and len(partes) >= 3:
-                f, c = int(partes[1]), int(partes[2])
-                if not self.mapa.dentro_de_limites(f, c):
-                    print("Fuera del mapa.")
-                    continue
-                self.destino = (f, c)
-                print("Destino fijado en", self.destino)
-                continue
+        if comando == 'destino' and len(partes) >= 3:
+            f, c = int(partes[1]), int(partes[2])
+            if not self.mapa.dentro_de_limites(f, c):
+                self._error("Fuera del mapa.")
+                return True
+            self.destino = (f, c)
+            self._decir("Destino fijado en", self.destino)
+            return True
 
-            if comando == 'buscar':
-                if self.inicio is None or self.destino is None:
-                    print("Define primero inicio y destino.")
-                    continue
-                ruta, modo = self.calculadora.encontrar_mejor_ruta(self.inicio, self.destino)
-                if ruta:
-                    self.ultima_ruta = ruta
-                    print(f"Ruta encontrada (modo: {modo}). Pasos: {len(ruta)-1}")
-                    self.mapa.mostrar(ruta, self.inicio, self.destino, self.modo_detallado)
-                else:
-                    print("No hay ruta posible.")
-                continue
+        if comando == 'buscar' and len(partes) >= 2 and partes[1] == 'costo':
+            if self.inicio is None or self.destino is None:
+                self._error("Define primero inicio y destino.")
+                return True
+            ruta, costo = self.calculadora.ruta_ponderada(self.inicio, self.destino)
+            if self.lote is not None:
+                self._emitir({'inicio': self.inicio, 'destino': self.destino, 'costo': costo,
+                              'pasos': len(ruta) - 1 if ruta else None, 'ruta': ruta})
+            if ruta:
+                self.ultima_ruta = ruta
+                self._decir(f"Ruta encontrada (costo: {costo}). Pasos: {len(ruta)-1}")
+                self._dibujar(ruta)
+            else:
+                self._decir("No hay ruta posible.")
+            return True
 
-            if comando == 'agregar' and len(partes) >= 4:
-                f, c, tipo = int(partes[1]), int(partes[2]), int(partes[3])
-                self.mapa.agregar_obstaculo(f, c, tipo)
-                print(f"Celda {(f,c)} modificada.")
-                continue
+        if comando == 'buscar':
+            if self.inicio is None or self.destino is None:
+                self._error("Define primero inicio y destino.")
+                return True
+            ruta, modo = self.calculadora.encontrar_mejor_ruta(self.inicio, self.destino)
+            if self.lote is not None:
+                self._emitir({'inicio': self.inicio, 'destino': self.destino, 'tipo': modo,
+                              'pasos': len(ruta) - 1 if ruta else None, 'ruta': ruta})
+            if ruta:
+                self.ultima_ruta = ruta
+                self._decir(f"Ruta encontrada (modo: {modo}). Pasos: {len(ruta)-1}")
+                self._dibujar(ruta)
+            else:
+                self._decir("No hay ruta posible.")
+            return True
 
-            if comando == 'quitar' and len(partes) >= 3:
-                f, c = int(partes[1]), int(partes[2])
-                self.mapa.quitar_obstaculo(f, c)
-                print(f"Celda {(f,c)} liberada.")
-                continue
+        if comando == 'agregar' and len(partes) >= 4:
+            f, c, tipo = int(partes[1]), int(partes[2]), int(partes[3])
+            self.mapa.agregar_obstaculo(f, c, tipo)
+            self._decir(f"Celda {(f,c)} modificada.")
+            return True
 
-            if comando == 'redimensionar' and len(partes) >= 3:
-                f, c = int(partes[1]), int(partes[2])
-                self.mapa.redimensionar(f, c)
-                self.mapa.generar_obstaculos_aleatorios()
-                print(f"Mapa redimensionado a {f}x{c}.")
-                continue
+        if comando == 'quitar' and len(partes) >= 3:
+            f, c = int(partes[1]), int(partes[2])
+            self.mapa.quitar_obstaculo(f, c)
+            self._decir(f"Celda {(f,c)} liberada.")
+            return True
 
-            if comando == 'guardar' and len(partes) >= 2:
-                nombre = partes[1]
-                self.mapa.guardar(nombre)
-                print("Mapa guardado en", nombre)
-                continue
+        if comando == 'redimensionar' and len(partes) >= 3:
+            f, c = int(partes[1]), int(partes[2])
+            self.mapa.redimensionar(f, c)
+            self.mapa.generar_obstaculos_aleatorios()
+            self._decir(f"Mapa redimensionado a {f}x{c}.")
+            return True
 
-            if comando == 'cargar' and len(partes) >= 2:
-                nombre = partes[1]
-                self.mapa = Mapa.cargar(nombre)
-                self.calculadora = CalculadoraDeRutas(self.mapa)
-                print("Mapa cargado desde", nombre)
-                continue
+        if comando == 'generar' and len(partes) >= 4:
+            f, c, semilla = int(partes[1]), int(partes[2]), int(partes[3])
+            conectar = [p for p in (self.inicio, self.destino) if p is not None and p[0] < f and p[1] < c]
+            self.mapa = Mapa.generar(f, c, semilla, conectar=conectar if len(conectar) == 2 else None)
+            self.calculadora = CalculadoraDeRutas(self.mapa, self.calculadora.modo,
+                                                  instrumentacion=self.calculadora.instrumentacion)
+            self.ultima_ruta = None
+            self._decir(f"Mapa {f}x{c} generado con semilla {semilla}.")
+            return True
 
-            if comando == 'alternar' and len(partes) >= 2 and partes[1] == 'detallado':
-                self.modo_detallado = not self.modo_detallado
-                print("Modo detallado =", self.modo_detallado)
-                continue
+        if comando == 'guardar' and len(partes) >= 2:
+            nombre = partes[1]
+            self.mapa.guardar(nombre)
+            self._decir("Mapa guardado en", nombre)
+            return True
+
+        if comando == 'cargar' and len(partes) >= 2:
+            nombre = partes[1]
+            self.mapa = Mapa.cargar(nombre)
+            self.calculadora = CalculadoraDeRutas(self.mapa, self.calculadora.modo,
+                                                  instrumentacion=self.calculadora.instrumentacion)
+            self._decir("Mapa cargado desde", nombre)
+            return True
+
+        if comando == 'costos' and len(partes) >= 3:
+            try:
+                self.mapa.fijar_costos({CAMINO_LIBRE: int(partes[1]), AGUA: int(partes[2])})
+            except ValueError as error:
+                self._error(str(error))
+                return True
+            self._decir("Costos del terreno =", self.mapa.costos)
+            return True
+
+        if comando == 'alternar' and len(partes) >= 2 and partes[1] == 'detallado':
+            self.modo_detallado = not self.modo_detallado
+            self._decir("Modo detallado =", self.modo_detallado)
+            return True
+
+        if comando == 'ventana' and len(partes) >= 2:
+            try:
+                self.ventana = renderizado.leer_ventana(partes[1:])
+            except ValueError as error:
+                self._error(str(error))
+                return True
+            self._decir("Ventana =", self.ventana or 'completa')
+            return True
+
+        if comando == 'modo' and len(partes) >= 2:
+            if partes[1] not in MODOS_BUSQUEDA:
+                self._error("Modos disponibles: " + ', '.join(MODOS_BUSQUEDA))
+                return True
+            self.calculadora.modo = partes[1]
+            self._decir("Modo de búsqueda =", partes[1])
+            return True
+
+        if comando == 'cache':
+            if self.calculadora.cache is None:
+                self._decir("Caché desactivada.")
+                return True
+            for nombre, valor in self.calculadora.cache.estadisticas().items():
+                self._decir(f" {nombre}: {valor}")
+            return True
+
+        if comando == 'stats':
+            self._stats(partes[1:])
+            return True
+
+        self._error("Comando desconocido. Escribe 'ayuda'.")
+        return True
+
+    def _stats(self, argumentos):
+        sumidero = self.calculadora.instrumentacion
+        if argumentos and argumentos[0] in ('on', 'off'):
+            if sumidero is not None:
+                sumidero.cerrar()
+            if argumentos[0] == 'off':
+                self.calculadora.instrumentacion = None
+                self._decir("Instrumentación desactivada.")
+                return
+            if len(argumentos) >= 2:
+                self.calculadora.instrumentacion = SumideroJSONL(argumentos[1])
+                self._decir("Midiendo búsquedas; registros en", argumentos[1])
+            else:
+                self.calculadora.instrumentacion = SumideroEnMemoria()
+                self._decir("Midiendo búsquedas en memoria.")
+            return
 
-            print("Comando desconocido. Escribe 'ayuda'.")
+        if sumidero is None:
+            self._decir("Instrumentación desactivada. Usa 'stats on'.")
+            return
+        for nombre, valor in sumidero.resumen().items():
+            self._decir(f" {nombre}: {valor}")
+        if isinstance(sumidero, SumideroEnMemoria):
+            for registro in sumidero.ultimos(5):
+                self._decir(f" {registro['operacion']} {registro['modo']} {registro['inicio']}->{registro['destino']}: "
+                      f"{registro['tiempo_s'] * 1000:.2f} ms, expandidos {registro['expandidos']}, "
+                      f"frontera {registro['frontera_max']}, agua {registro['paso_agua']}, pasos {registro['pasos']}")
 
 
 # ---------------------------
 # PROGRAMA PRINCIPAL
 # ---------------------------
+# python calculadora2.py                     -> modo interactivo
+# python calculadora2.py --lote [archivo]    -> comandos desde archivo (o stdin), salida JSON
 if __name__ == "__main__":
     random.seed()
     mapa = Mapa(10, 10)
     mapa.generar_obstaculos_aleatorios()
     interfaz = InterfazCLI(mapa)
-    interfaz.ejecutar()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == '--lote':
+            if len(sys.argv) > 2 and sys.argv[2] != '-':
+                with open(sys.argv[2]) as archivo:
+                    interfaz.ejecutar_lote(archivo)
+            else:
+                interfaz.ejecutar_lote(sys.stdin)
+        else:
+            interfaz.ejecutar()
+    finally:
+        interfaz.cerrar()
@@ -1,54 +1,339 @@
 """
-Servidor de chat simple usando selectors.
+Servidor de chat simple usando selectors (o asyncio, con --engine asyncio).
 - Acepta múltiples clientes.
-- Broadcast: lo que envía un cliente llega a todos los demás.
+- Salas: cada cliente entra a 'general' al conectarse y puede sumarse a otras con
+  "/join sala" (pasa a ser su sala actual), salir con "/leave [sala]" y ver las suyas
+  con "/rooms". Lo que envía llega a los demás miembros de su sala actual; el índice
+  sala -> miembros (RoomIndex) hace que el broadcast sólo recorra esos miembros.
 - Usa non-blocking sockets y selectors.
+- Cada cliente tiene su búfer de salida (data.outb): broadcast sólo agrega bytes ahí y
+  EVENT_WRITE se registra mientras haya algo pendiente, así un cliente lento no frena
+  al resto ni se desconecta porque su buffer del kernel esté lleno.
 - Maneja desconexiones limpias y socketes muertos.
+- Con asyncio cada conexión es un ChatProtocol: transport.write hace el buffering y
+  get_write_buffer_size aplica el mismo límite MAX_OUTB.
+- Los mensajes van enmarcados (--framing): 'line' termina cada mensaje con '\n' y
+  'length' lo precede con su largo en 4 bytes big-endian. Se reenvían sólo mensajes
+  completos, con el mismo enmarcado.
+- La recepción usa recv_into sobre un bytearray preasignado por conexión (FrameReader)
+  y los mensajes se recortan con memoryview sin copiar.
+- Con --workers N se forkean N procesos con el motor selectors que comparten el puerto
+  con SO_REUSEPORT. Cada par de workers está unido por un socketpair Unix: lo que llega
+  a un worker se reenvía una sola vez a cada uno de los otros por ese enlace, que
+  conserva el orden, y cada uno lo entrega a sus clientes.
+
+Uso:
+    python cliente.py [--engine selectors|asyncio] [--framing line|length] [--workers N]
+                      [--host H] [--port P]
 """
 
+import argparse
+import asyncio
+import os
 import selectors
+import signal
 import socket
+import struct
 import types
 import sys
 import traceback
 
 HOST = '0.0.0.0'
 PORT = 5000
+# Bytes pendientes que se toleran por cliente; si no lee y se pasa de esto se desconecta
+MAX_OUTB = 1 << 20
+# Largo máximo de un mensaje entrante; quien mande uno más largo se desconecta
+MAX_FRAME = 64 * 1024
+FRAMING = 'line'
+LENGTH_HEADER = struct.Struct('!I')
+# Margen para el prefijo "[host:puerto] " y la sala en los mensajes que viajan entre workers
+MAX_PREFIX = 256
+DEFAULT_ROOM = 'general'
+MAX_ROOM_NAME = 64
 sel = selectors.DefaultSelector()
+# Enlaces hacia los otros workers (sólo en modo --workers)
+links = []
+
+
+class FrameError(Exception):
+    pass
+
+
+class FrameReader:
+    """
+    Búfer de entrada de una conexión. writable() da la parte libre para recv_into y
+    feed(n) devuelve los mensajes completos como memoryviews sobre el búfer (sin el
+    encabezado de largo, pero con el '\n' en modo 'line'). Esas vistas valen hasta la
+    próxima llamada a writable(), que es cuando se compacta lo que quedó a medias.
+    """
+
+    def __init__(self, framing=FRAMING, max_frame=MAX_FRAME):
+        self.framing = framing
+        self.max_frame = max_frame
+        self.buf = bytearray(max_frame + LENGTH_HEADER.size)
+        self.view = memoryview(self.buf)
+        self.start = 0   # comienzo del primer mensaje sin procesar
+        self.scan = 0    # hasta dónde ya se buscó '\n' (modo 'line')
+        self.end = 0     # fin de los datos recibidos
+
+    def writable(self):
+        if self.start == self.end:
+            self.start = self.scan = self.end = 0
+        elif self.end == len(self.buf):
+            if self.start == 0:
+                raise FrameError(f"mensaje de más de {self.max_frame} bytes")
+            pending = self.end - self.start
+            self.buf[:pending] = self.buf[self.start:self.end]
+            self.scan -= self.start
+            self.start, self.end = 0, pending
+        return self.view[self.end:]
+
+    def feed(self, nbytes):
+        self.end += nbytes
+        frames = []
+        buf, view, start, end = self.buf, self.view, self.start, self.end
+        if self.framing == 'line':
+            pos = buf.find(b'\n', self.scan, end)
+            while pos >= 0:
+                frames.append(view[start:pos + 1])
+                start = pos + 1
+                pos = buf.find(b'\n', start, end)
+            self.scan = end
+        else:
+            header = LENGTH_HEADER.size
+            while end - start >= header:
+                (size,) = LENGTH_HEADER.unpack_from(buf, start)
+                if size > self.max_frame:
+                    raise FrameError(f"mensaje de {size} bytes (máximo {self.max_frame})")
+                if end - start - header < size:
+                    break
+                frames.append(view[start + header:start + header + size])
+                start += header + size
+        self.start = start
+        return frames
+
+
+def encode_frames(framing, prefix, frames):
+    # Todos los mensajes completos de una lectura, ya con prefijo y enmarcado, en un solo
+    # bytes que se comparte entre todos los destinos: una copia por lectura y un envío
+    # por destino, no uno por mensaje.
+    parts = []
+    for payload in frames:
+        if framing == 'length':
+            parts.append(LENGTH_HEADER.pack(len(prefix) + len(payload)))
+        parts.append(prefix)
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def encode_relay(framing, prefix, frames, room):
+    # Para los enlaces entre workers: cada mensaje ya enmarcado para los clientes va
+    # dentro de otro encabezado de largo, precedido por la sala (un byte de largo y el
+    # nombre), así el worker que lo recibe no re-parsea.
+    room_bytes = room.encode('utf-8')
+    room_part = bytes((len(room_bytes),)) + room_bytes
+    parts = []
+    for payload in frames:
+        size = len(prefix) + len(payload)
+        if framing == 'length':
+            parts.append(LENGTH_HEADER.pack(len(room_part) + LENGTH_HEADER.size + size))
+            parts.append(room_part)
+            parts.append(LENGTH_HEADER.pack(size))
+        else:
+            parts.append(LENGTH_HEADER.pack(len(room_part) + size))
+            parts.append(room_part)
+        parts.append(prefix)
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def decode_relay(frames):
+    # Inversa de encode_relay: agrupa los mensajes consecutivos de una misma sala y
+    # devuelve pares (sala, bytes listos para los clientes)
+    groups = []
+    for frame in frames:
+        size = frame[0]
+        room = bytes(frame[1:1 + size]).decode('utf-8')
+        if groups and groups[-1][0] == room:
+            groups[-1][1].append(frame[1 + size:])
+        else:
+            groups.append((room, [frame[1 + size:]]))
+    return [(room, b''.join(parts)) for room, parts in groups]
+
+
+# ---- Salas ----
+class RoomIndex:
+    "Índice sala -> miembros. Cada miembro lleva sus salas en .rooms y la actual en .room"
+
+    def __init__(self):
+        self.members_of = {}
+
+    def members(self, room):
+        return self.members_of.get(room, ())
 
-def accept_wrapper(sock):
+    def join(self, member, state, room):
+        self.members_of.setdefault(room, set()).add(member)
+        state.rooms.add(room)
+        state.room = room
+
+    def leave(self, member, state, room):
+        members = self.members_of.get(room)
+        if members is not None:
+            members.discard(member)
+            if not members:
+                del self.members_of[room]
+        state.rooms.discard(room)
+        if state.room == room:
+            state.room = None
+
+    def leave_all(self, member, state):
+        for room in list(state.rooms):
+            self.leave(member, state, room)
+
+
+def split_commands(frames):
+    # Agrupa los mensajes de chat consecutivos; cada comando ("/...") corta el grupo
+    # porque puede cambiar la sala de los que siguen
+    batch = []
+    for frame in frames:
+        if frame[:1] == b'/':
+            if batch:
+                yield None, batch
+                batch = []
+            yield frame, None
+        else:
+            batch.append(frame)
+    if batch:
+        yield None, batch
+
+
+def apply_command(index, member, state, frame):
+    # Ejecuta un comando de sala y devuelve el aviso para quien lo mandó
+    words = bytes(frame).decode('utf-8', 'replace').split()
+    command, args = words[0], words[1:]
+    if command in ('/join', '/leave') and args and (len(args) > 1 or len(args[0].encode('utf-8')) > MAX_ROOM_NAME):
+        return f"nombre de sala inválido (sin espacios, hasta {MAX_ROOM_NAME} bytes)"
+    if command == '/join' and args:
+        index.join(member, state, args[0])
+        return f"estás en '{args[0]}' ({len(index.members(args[0]))} miembros)"
+    if command == '/leave':
+        room = args[0] if args else state.room
+        if room not in state.rooms:
+            return f"no estás en '{room}'" if room else "no estás en ninguna sala"
+        index.leave(member, state, room)
+        return f"saliste de '{room}'"
+    if command == '/rooms':
+        return f"salas: {', '.join(sorted(state.rooms)) or '-'} (actual: {state.room or '-'})"
+    return "comandos: /join sala, /leave [sala], /rooms"
+
+
+def encode_notice(framing, text):
+    # Aviso del servidor para un solo cliente, con el mismo enmarcado que los mensajes
+    payload = f"* {text}".encode('utf-8')
+    return encode_frames(framing, b'', [payload + b'\n' if framing == 'line' else payload])
+
+
+rooms = RoomIndex()
+
+
+def accept_wrapper(sock, framing=FRAMING):
     conn, addr = sock.accept()  # socket ya en modo non-blocking
     print(f"Conexión entrante desde {addr}")
     conn.setblocking(False)
-    data = types.SimpleNamespace(addr=addr, inb=b'', outb=b'')
+    prefix = f"[{addr[0]}:{addr[1]}] ".encode('utf-8')
+    data = types.SimpleNamespace(addr=addr, prefix=prefix, inb=FrameReader(framing), outb=bytearray(),
+                                 writing=False, link=False, rooms=set(), room=None)
     sel.register(conn, selectors.EVENT_READ, data=data)
+    rooms.join(conn, data, DEFAULT_ROOM)
 
-def broadcast(sender_sock, message_bytes):
-    # Enviar message_bytes a todos menos al sender
+def broadcast(sender_sock, message_bytes, room=DEFAULT_ROOM):
+    # Encolar message_bytes para los miembros de la sala menos el sender; nunca bloquea
     to_remove = []
-    for key in list(sel.get_map().values()):
-        sock = key.fileobj
-        data = key.data
-        # saltar el socket del servidor (es un socket escuchador sin data)
-        if data is None:
-            continue
+    for sock in list(rooms.members(room)):
         if sock is sender_sock:
             continue
-        try:
-            sock.sendall(message_bytes)
-        except Exception as e:
-            print(f"[!] Error enviando a {data.addr}: {e}. Marcando para eliminar.")
+        data = sel.get_key(sock).data
+        if len(data.outb) + len(message_bytes) > MAX_OUTB:
+            print(f"[!] {data.addr} tiene {len(data.outb)} bytes sin leer. Marcando para eliminar.")
             to_remove.append(sock)
+            continue
+        data.outb += message_bytes
+        if not data.writing:
+            # Sin envíos pendientes se intenta mandar ya; lo que no entre espera EVENT_WRITE
+            try:
+                flush(sock, data)
+            except OSError as e:
+                print(f"[!] Error enviando a {data.addr}: {e}. Marcando para eliminar.")
+                to_remove.append(sock)
     # limpiar sockets fallidos
     for s in to_remove:
         safe_unregister_and_close(s)
 
+def send_to(sock, data, message_bytes):
+    # Un mensaje para un solo cliente (avisos de comandos), con el mismo límite MAX_OUTB
+    # que broadcast; devuelve False si el cliente se desconectó por no leer
+    if len(data.outb) + len(message_bytes) > MAX_OUTB:
+        print(f"[!] {data.addr} tiene {len(data.outb)} bytes sin leer. Eliminando.")
+        safe_unregister_and_close(sock)
+        return False
+    data.outb += message_bytes
+    if not data.writing:
+        flush(sock, data)
+    return True
+
+def handle_frames(sock, data, frames):
+    # Mensajes de chat a la sala actual (localmente y a los otros workers); comandos aparte
+    framing = data.inb.framing
+    for command, batch in split_commands(frames):
+        if command is not None:
+            if not send_to(sock, data, encode_notice(framing, apply_command(rooms, sock, data, command))):
+                return
+        elif data.room is None:
+            if not send_to(sock, data, encode_notice(framing, "no estás en ninguna sala (/join sala)")):
+                return
+        else:
+            broadcast(sock, encode_frames(framing, data.prefix, batch), data.room)
+            if links:
+                relay(encode_relay(framing, data.prefix, batch, data.room))
+
+def relay(message_bytes):
+    # Encolar para cada uno de los otros workers; los enlaces no tienen límite MAX_OUTB
+    # porque cortar uno haría perder mensajes a todos los clientes de ese worker
+    for link in list(links):
+        data = sel.get_key(link).data
+        data.outb += message_bytes
+        if not data.writing:
+            try:
+                flush(link, data)
+            except OSError as e:
+                print(f"[!] Error enviando al {data.addr}: {e}.")
+                safe_unregister_and_close(link)
+
+def flush(sock, data):
+    # Manda lo que acepte el kernel y deja el resto en data.outb. EVENT_WRITE queda
+    # registrado sólo mientras haya bytes pendientes.
+    if data.outb:
+        try:
+            sent = sock.send(data.outb)
+        except BlockingIOError:
+            sent = 0
+        del data.outb[:sent]
+    pending = bool(data.outb)
+    if pending != data.writing:
+        data.writing = pending
+        events = selectors.EVENT_READ | selectors.EVENT_WRITE if pending else selectors.EVENT_READ
+        sel.modify(sock, events, data=data)
+
 def safe_unregister_and_close(sock):
     try:
         key = sel.get_key(sock)
         addr = key.data.addr if key.data else ('?', '?')
+        if key.data is not None and not key.data.link:
+            rooms.leave_all(sock, key.data)
     except KeyError:
         addr = ('?', '?')
+    if sock in links:
+        links.remove(sock)
     try:
         sel.unregister(sock)
     except Exception:
@@ -62,19 +347,38 @@ def safe_unregister_and_close(sock):
 def service_connection(key, mask):
     sock = key.fileobj
     data = key.data
+    if sock.fileno() == -1:
+        # Se cerró antes en esta misma vuelta (p. ej. broadcast lo descartó por lento)
+        return
     try:
         if mask & selectors.EVENT_READ:
-            recv_data = sock.recv(4096)  # recibe bytes
-            if recv_data:
-                # Mensaje recibido: reenviarlo a todos
-                # Opcional: puedes inspeccionar/parsear el mensaje aquí
-                prefix = f"[{data.addr[0]}:{data.addr[1]}] ".encode('utf-8')
-                broadcast(sock, prefix + recv_data)
+            nbytes = sock.recv_into(data.inb.writable())  # directo al búfer de la conexión
+            if nbytes:
+                # Reenviar sólo los mensajes que llegaron completos
+                frames = data.inb.feed(nbytes)
+                if frames and data.link:
+                    # Mensajes de clientes de otro worker: ya vienen enmarcados
+                    for room, message_bytes in decode_relay(frames):
+                        broadcast(None, message_bytes, room)
+                elif frames:
+                    handle_frames(sock, data, frames)
+                    if sock.fileno() == -1:
+                        # send_to lo desconectó por no leer sus avisos
+                        return
             else:
                 # socket cerrado por el cliente
                 print(f"Cliente {data.addr} desconectó.")
                 safe_unregister_and_close(sock)
-    except ConnectionResetError:
+                return
+        if mask & selectors.EVENT_WRITE:
+            # El socket volvió a aceptar datos: seguir con lo pendiente
+            flush(sock, data)
+    except FrameError as e:
+        print(f"[!] {data.addr} envió un mensaje inválido: {e}.")
+        safe_unregister_and_close(sock)
+    except BlockingIOError:
+        pass
+    except (ConnectionResetError, BrokenPipeError):
         print(f"ConnectionResetError: {data.addr} desapareció abruptamente.")
         safe_unregister_and_close(sock)
     except Exception:
@@ -82,12 +386,15 @@ def service_connection(key, mask):
         traceback.print_exc()
         safe_unregister_and_close(sock)
 
-def main():
+def serve_selectors(host=HOST, port=PORT, framing=FRAMING, reuse_port=False):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as lsock:
         lsock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        lsock.bind((HOST, PORT))
+        if reuse_port:
+            # Varios workers escuchan en el mismo puerto; el kernel reparte las conexiones
+            lsock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        lsock.bind((host, port))
         lsock.listen()
-        print(f"Servidor escuchando en {HOST}:{PORT}")
+        print(f"Servidor escuchando en {host}:{port}")
         lsock.setblocking(False)
         # Registrar socket de escucha con data=None para identificarlo
         sel.register(lsock, selectors.EVENT_READ, data=None)
@@ -98,7 +405,7 @@ def main():
                 for key, mask in events:
                     if key.data is None:
                         # Evento en socket de escucha -> aceptar nueva conexión
-                        accept_wrapper(key.fileobj)
+                        accept_wrapper(key.fileobj, framing)
                     else:
                         service_connection(key, mask)
         except KeyboardInterrupt:
@@ -119,5 +426,184 @@ def main():
             sel.close()
             print("Servidor cerrado.")
 
+# Modo multi-proceso: N workers del motor selectors unidos de a pares por socketpairs
+def run_worker(index, host, port, framing, peers):
+    global sel
+    # El epoll heredado del padre no se comparte: cada worker arma el suyo
+    sel.close()
+    sel = selectors.DefaultSelector()
+    for other, link in peers.items():
+        link.setblocking(False)
+        data = types.SimpleNamespace(addr=('worker', other), inb=FrameReader('length', MAX_FRAME + MAX_PREFIX),
+                                     outb=bytearray(), writing=False, link=True)
+        sel.register(link, selectors.EVENT_READ, data=data)
+        links.append(link)
+    print(f"Worker {index} (pid {os.getpid()}) enlazado con {len(peers)} workers")
+    serve_selectors(host, port, framing, reuse_port=True)
+
+
+def serve_workers(host=HOST, port=PORT, framing=FRAMING, workers=2):
+    pairs = {}
+    for i in range(workers):
+        for j in range(i + 1, workers):
+            pairs[i, j] = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    children = []
+    for index in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            peers = {}
+            for (i, j), (a, b) in pairs.items():
+                if index in (i, j):
+                    peers[j if index == i else i] = a if index == i else b
+                    (b if index == i else a).close()
+                else:
+                    a.close()
+                    b.close()
+            code = 0
+            try:
+                run_worker(index, host, port, framing, peers)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children.append(pid)
+    # El padre sólo espera a los workers. SIGTERM se trata como Ctrl-C para no dejar
+    # workers huérfanos; se instala después del fork, así los workers no lo heredan.
+    for a, b in pairs.values():
+        a.close()
+        b.close()
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for pid in children:
+            os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+    print("Workers terminados.")
+
+
+# Motor asyncio: misma semántica de accept/broadcast/desconexión que el loop de arriba
+# BufferedProtocol: el loop hace recv_into sobre lo que devuelve get_buffer.
+class ChatProtocol(asyncio.BufferedProtocol):
+    room_index = RoomIndex()
+
+    def __init__(self, framing=FRAMING):
+        self.inb = FrameReader(framing)
+        self.rooms = set()
+        self.room = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info('peername')
+        print(f"Conexión entrante desde {self.addr}")
+        self.prefix = f"[{self.addr[0]}:{self.addr[1]}] ".encode('utf-8')
+        self.room_index.join(self, self, DEFAULT_ROOM)
+
+    def get_buffer(self, sizehint):
+        try:
+            return self.inb.writable()
+        except FrameError as e:
+            print(f"[!] {self.addr} envió un mensaje inválido: {e}.")
+            self.transport.abort()
+            # El loop igual hace un recv_into; se descarta en buffer_updated
+            return bytearray(1)
+
+    def buffer_updated(self, nbytes):
+        if self.transport.is_closing():
+            return
+        try:
+            frames = self.inb.feed(nbytes)
+        except FrameError as e:
+            print(f"[!] {self.addr} envió un mensaje inválido: {e}.")
+            self.transport.abort()
+            return
+        framing = self.inb.framing
+        for command, batch in split_commands(frames):
+            if command is not None:
+                notice = apply_command(self.room_index, self, self, command)
+                if not self.send_notice(encode_notice(framing, notice)):
+                    return
+            elif self.room is None:
+                if not self.send_notice(encode_notice(framing, "no estás en ninguna sala (/join sala)")):
+                    return
+            else:
+                broadcast_async(self, encode_frames(framing, self.prefix, batch), self.room)
+
+    def send_notice(self, message_bytes):
+        # Mismo límite MAX_OUTB que broadcast_async; False si se cortó la conexión
+        if self.transport.get_write_buffer_size() + len(message_bytes) > MAX_OUTB:
+            print(f"[!] {self.addr} tiene {self.transport.get_write_buffer_size()} bytes sin leer. Eliminando.")
+            self.transport.abort()
+            return False
+        self.transport.write(message_bytes)
+        return True
+
+    def eof_received(self):
+        print(f"Cliente {self.addr} desconectó.")
+        # Devolver None hace que el transport se cierre
+
+    def connection_lost(self, exc):
+        if exc is not None:
+            print(f"Conexión perdida con {self.addr}: {exc}")
+        self.room_index.leave_all(self, self)
+        print(f"Conexión cerrada: {self.addr}")
+
+
+def broadcast_async(sender, message_bytes, room=DEFAULT_ROOM):
+    # transport.write nunca bloquea: lo que el kernel no acepta queda en el búfer del
+    # transport y el loop lo manda cuando el socket vuelve a aceptar datos
+    for client in list(ChatProtocol.room_index.members(room)):
+        if client is sender or client.transport.is_closing():
+            continue
+        if client.transport.get_write_buffer_size() + len(message_bytes) > MAX_OUTB:
+            print(f"[!] {client.addr} tiene {client.transport.get_write_buffer_size()} bytes sin leer. Eliminando.")
+            client.transport.abort()
+            continue
+        client.transport.write(message_bytes)
+
+
+async def _serve_asyncio(host, port, framing):
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: ChatProtocol(framing), host, port, reuse_address=True)
+    print(f"Servidor escuchando en {host}:{port} (asyncio)")
+    async with server:
+        await server.serve_forever()
+
+
+def serve_asyncio(host=HOST, port=PORT, framing=FRAMING):
+    try:
+        asyncio.run(_serve_asyncio(host, port, framing))
+    except KeyboardInterrupt:
+        print("Servidor detenido por usuario (Ctrl-C).")
+    finally:
+        print("Servidor cerrado.")
+
+
+ENGINES = {'selectors': serve_selectors, 'asyncio': serve_asyncio}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de chat")
+    parser.add_argument('--engine', choices=list(ENGINES), default='selectors')
+    parser.add_argument('--framing', choices=('line', 'length'), default=FRAMING)
+    parser.add_argument('--workers', type=int, default=1, help="procesos que comparten el puerto (selectors)")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    args = parser.parse_args(argv)
+    if args.workers > 1:
+        if args.engine != 'selectors':
+            parser.error("--workers sólo funciona con --engine selectors")
+        if not hasattr(socket, 'SO_REUSEPORT'):
+            parser.error("este sistema no tiene SO_REUSEPORT")
+        serve_workers(args.host, args.port, args.framing, args.workers)
+    else:
+        ENGINES[args.engine](args.host, args.port, args.framing)
+
 if __name__ == "__main__":
     main()
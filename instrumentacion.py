@@ -0,0 +1,164 @@
+"""
+Instrumentación opcional de las búsquedas de calculadora.py y calculadora2.py.
+
+Por consulta se registra cuántas celdas se expandieron, el largo máximo que alcanzó la
+frontera (cola o heap), si corrió la pasada con agua, si la respondió la caché y el
+tiempo de reloj. Los registros son diccionarios que se entregan a un sumidero:
+- SumideroEnMemoria: anillo con los últimos N registros.
+- SumideroJSONL: agrega una línea JSON por registro a un archivo.
+Cualquier objeto con un método registrar(registro) sirve como sumidero; cerrar() (o
+close()) libera lo que el sumidero tenga abierto.
+
+Con la instrumentación desactivada las búsquedas usan deque y heapq tal cual; los
+contadores sólo existen dentro de medir_consulta, que les pasa a la búsqueda una cola y
+funciones de heap que cuentan.
+"""
+
+import abc
+from collections import deque
+import heapq
+import json
+import time
+
+
+class Medicion:
+    "Contadores de una consulta en curso"
+
+    def __init__(self):
+        self.expandidos = 0
+        self.frontera_max = 0
+        self.paso_agua = False
+        self.acierto_cache = False
+
+    def cola(self, iterable=()):
+        return ColaInstrumentada(self, iterable)
+
+    def heappush(self, heap, elemento):
+        heapq.heappush(heap, elemento)
+        if len(heap) > self.frontera_max:
+            self.frontera_max = len(heap)
+
+    def heappop(self, heap):
+        if len(heap) > self.frontera_max:
+            self.frontera_max = len(heap)
+        self.expandidos += 1
+        return heapq.heappop(heap)
+
+
+class ColaInstrumentada(deque):
+    "deque que cuenta las celdas sacadas con popleft y el largo máximo de la cola"
+
+    def __init__(self, medicion, iterable=()):
+        super().__init__(iterable)
+        self.medicion = medicion
+        if len(self) > medicion.frontera_max:
+            medicion.frontera_max = len(self)
+
+    def append(self, elemento):
+        super().append(elemento)
+        if len(self) > self.medicion.frontera_max:
+            self.medicion.frontera_max = len(self)
+
+    def popleft(self):
+        self.medicion.expandidos += 1
+        return super().popleft()
+
+
+def medir_consulta(sumidero, datos, buscar):
+    # Corre buscar(medicion), arma el registro con `datos` más lo medido y lo entrega al
+    # sumidero. Un valor presente en `datos` tiene prioridad sobre el medido. Devuelve lo
+    # mismo que buscar: una ruta o un par (ruta, tipo).
+    medicion = Medicion()
+    t0 = time.perf_counter()
+    resultado = buscar(medicion)
+    tiempo = time.perf_counter() - t0
+
+    ruta = resultado[0] if isinstance(resultado, tuple) else resultado
+    registro = dict(datos)
+    registro.setdefault('expandidos', medicion.expandidos)
+    registro.setdefault('frontera_max', medicion.frontera_max)
+    registro.setdefault('paso_agua', medicion.paso_agua)
+    registro['acierto_cache'] = medicion.acierto_cache
+    registro['tiempo_s'] = tiempo
+    registro['pasos'] = len(ruta) - 1 if ruta else None
+    sumidero.registrar(registro)
+    return resultado
+
+
+# ---------------------------
+# SUMIDEROS
+# ---------------------------
+class _Sumidero(abc.ABC):
+    # Lleva totales acumulados para resumen(); las subclases guardan el registro
+    def __init__(self):
+        self.consultas = 0
+        self.sin_ruta = 0
+        self.con_agua = 0
+        self.tiempo_total = 0.0
+        self.tiempo_max = 0.0
+        self.expandidos_total = 0
+        self.frontera_max = 0
+
+    def registrar(self, registro):
+        self.consultas += 1
+        self.sin_ruta += registro['pasos'] is None
+        self.con_agua += bool(registro['paso_agua'])
+        self.tiempo_total += registro['tiempo_s']
+        self.tiempo_max = max(self.tiempo_max, registro['tiempo_s'])
+        self.expandidos_total += registro['expandidos'] or 0
+        self.frontera_max = max(self.frontera_max, registro['frontera_max'] or 0)
+        self._guardar(registro)
+
+    @abc.abstractmethod
+    def _guardar(self, registro):
+        pass
+
+    def cerrar(self):
+        pass
+
+    def close(self):
+        # Para contextlib.closing y código que espera la interfaz de archivos
+        self.cerrar()
+
+    def resumen(self):
+        n = self.consultas or 1
+        return {
+            'consultas': self.consultas,
+            'sin_ruta': self.sin_ruta,
+            'con_agua': self.con_agua,
+            'tiempo_medio_ms': round(1000 * self.tiempo_total / n, 3),
+            'tiempo_max_ms': round(1000 * self.tiempo_max, 3),
+            'expandidos_medio': round(self.expandidos_total / n, 1),
+            'frontera_max': self.frontera_max,
+        }
+
+
+class SumideroEnMemoria(_Sumidero):
+    "Guarda los últimos `capacidad` registros en memoria"
+
+    def __init__(self, capacidad=1000):
+        super().__init__()
+        self.registros = deque(maxlen=capacidad)
+
+    def _guardar(self, registro):
+        self.registros.append(registro)
+
+    def ultimos(self, cantidad=10):
+        return list(self.registros)[-cantidad:]
+
+
+class SumideroJSONL(_Sumidero):
+    "Agrega cada registro como una línea JSON al final del archivo"
+
+    def __init__(self, ruta):
+        super().__init__()
+        self.ruta = ruta
+        self._archivo = open(ruta, 'a', encoding='utf-8')
+
+    def _guardar(self, registro):
+        self._archivo.write(json.dumps(registro) + '\n')
+        self._archivo.flush()
+
+    def cerrar(self):
+        if not self._archivo.closed:
+            self._archivo.close()
@@ -0,0 +1,94 @@
+"""
+Lector de mapas en formato texto compartido por calculadora.py y calculadora2.py.
+
+Formato:
+- Una fila del mapa por línea, con los valores separados por espacios y/o comas.
+- Se saltan las líneas vacías y las que empiezan con '#'.
+- Todas las filas deben tener el mismo número de columnas.
+- Cada valor es un entero entre 0 y 255.
+
+El archivo se lee en bloques grandes de bytes. Cada línea se convierte de una sola vez
+con bytes.translate: primero se clasifica cada byte (dígito, separador u otro) y, si la
+línea sólo tiene valores de un dígito, se borran los separadores y los dígitos ASCII se
+traducen directamente a su valor. Sólo las líneas con valores de varios dígitos o con
+caracteres raros pasan por int(), token a token.
+"""
+
+TAM_BLOQUE = 1 << 22  # 4 MiB por lectura
+
+_SEPARADORES = b' \t\r,'
+
+
+def _tabla_clases():
+    tabla = bytearray(b'?' * 256)
+    for digito in b'0123456789':
+        tabla[digito] = ord('d')
+    for separador in _SEPARADORES:
+        tabla[separador] = ord(' ')
+    return bytes(tabla)
+
+
+_CLASES = _tabla_clases()
+_DIGITO_A_VALOR = bytes.maketrans(b'0123456789', bytes(range(10)))
+
+
+def _parsear_linea(linea, numero):
+    clases = linea.translate(_CLASES)
+    if b'?' not in clases and b'dd' not in clases:
+        # Camino rápido: todos los valores son de un dígito
+        return linea.translate(_DIGITO_A_VALOR, _SEPARADORES)
+
+    valores = []
+    for token in linea.replace(b',', b' ').split():
+        try:
+            valor = int(token)
+        except ValueError:
+            raise ValueError(f"Línea {numero}: valor inválido {token.decode('utf-8', 'replace')!r}") from None
+        if not 0 <= valor <= 255:
+            raise ValueError(f"Línea {numero}: valor fuera de rango {valor} (debe estar entre 0 y 255)")
+        valores.append(valor)
+    return bytes(valores)
+
+
+def leer_mapa_texto(ruta_archivo, tam_bloque=TAM_BLOQUE):
+    "Lee un mapa en formato texto y devuelve (filas, columnas, celdas) con celdas como bytearray fila tras fila"
+
+    celdas = bytearray()
+    filas = 0
+    columnas = None
+    numero = 0
+    resto = b''
+
+    def agregar(linea):
+        nonlocal filas, columnas
+        linea = linea.strip()
+        if not linea or linea[0] == ord('#'):
+            return
+        fila = _parsear_linea(linea, numero)
+        if not fila:
+            raise ValueError(f"Línea {numero}: la fila no tiene valores")
+        if columnas is None:
+            columnas = len(fila)
+        elif len(fila) != columnas:
+            raise ValueError(f"Línea {numero}: las filas del mapa tienen diferente número de columnas "
+                             f"({len(fila)} en lugar de {columnas})")
+        celdas.extend(fila)
+        filas += 1
+
+    with open(ruta_archivo, 'rb') as archivo:
+        while True:
+            bloque = archivo.read(tam_bloque)
+            if not bloque:
+                break
+            lineas = (resto + bloque).split(b'\n')
+            resto = lineas.pop()
+            for linea in lineas:
+                numero += 1
+                agregar(linea)
+        if resto:
+            numero += 1
+            agregar(resto)
+
+    if not filas:
+        raise ValueError("El archivo de mapa está vacío o no contiene filas válidas")
+    return filas, columnas, celdas
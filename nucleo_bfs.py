@@ -0,0 +1,251 @@
+"""
+Núcleo de BFS sobre índices planos compartido por calculadora.py y calculadora2.py.
+
+La celda (f, c) es el entero f*columnas + c. Los búferes se reservan una vez por tamaño
+de mapa y se reutilizan entre búsquedas:
+- marca: array('I') con la generación en la que se visitó cada celda. Cada búsqueda usa
+  una generación nueva, así que "visitado" se reinicia sin recorrer el array.
+- previo: array('i') con el índice desde el que se llegó a cada celda.
+tierra_luego_agua reserva un rango de generaciones y guarda en marca base + distancia:
+visitada es marca >= base, y la distancia sale gratis sin otro array.
+La cola guarda enteros y las tuplas (f, c) sólo se crean al reconstruir la ruta final.
+"""
+
+from array import array
+from collections import deque
+
+_MAX_GENERACION = 0xFFFFFFFF
+
+
+class NucleoBFS:
+    def __init__(self, filas, columnas):
+        self.filas = filas
+        self.columnas = columnas
+        total = filas * columnas
+        self.marca = array('I', bytes(4 * total))
+        self.previo = array('i', bytes(4 * total))
+        self.generacion = 0
+
+    def _nueva_generacion(self, niveles=1):
+        # Reserva `niveles` generaciones seguidas y devuelve la primera
+        if self.generacion + niveles > _MAX_GENERACION:
+            # Al agotar los 32 bits se vuelve a empezar desde cero
+            self.marca = array('I', bytes(4 * len(self.marca)))
+            self.generacion = 0
+        base = self.generacion + 1
+        self.generacion += niveles
+        return base
+
+    def buscar(self, celdas, transitable, origen, destino, crear_cola=deque):
+        """
+        BFS de origen a destino (índices planos). transitable[valor] dice si se puede pisar
+        una celda con ese valor. Devuelve la ruta como lista de (f, c) o None. Los vecinos
+        se prueban en el orden de MOVIMIENTOS (abajo, arriba, derecha, izquierda), así la
+        ruta es la misma que daban las versiones con listas de listas.
+        """
+        generacion = self._nueva_generacion()
+        marca, previo, columnas = self.marca, self.previo, self.columnas
+        total = len(marca)
+
+        marca[origen] = generacion
+        previo[origen] = -1
+        cola = crear_cola([origen])
+        sacar, encolar = cola.popleft, cola.append
+
+        while cola:
+            actual = sacar()
+            if actual == destino:
+                break
+            columna = actual % columnas
+            vecino = actual + columnas
+            if vecino < total and marca[vecino] != generacion and transitable[celdas[vecino]]:
+                marca[vecino] = generacion
+                previo[vecino] = actual
+                encolar(vecino)
+            vecino = actual - columnas
+            if vecino >= 0 and marca[vecino] != generacion and transitable[celdas[vecino]]:
+                marca[vecino] = generacion
+                previo[vecino] = actual
+                encolar(vecino)
+            if columna + 1 < columnas:
+                vecino = actual + 1
+                if marca[vecino] != generacion and transitable[celdas[vecino]]:
+                    marca[vecino] = generacion
+                    previo[vecino] = actual
+                    encolar(vecino)
+            if columna:
+                vecino = actual - 1
+                if marca[vecino] != generacion and transitable[celdas[vecino]]:
+                    marca[vecino] = generacion
+                    previo[vecino] = actual
+                    encolar(vecino)
+
+        if marca[destino] != generacion:
+            return None
+        return self._ruta(destino)
+
+    def _ruta(self, destino):
+        previo, columnas = self.previo, self.columnas
+        ruta = []
+        actual = destino
+        while actual != -1:
+            ruta.append(divmod(actual, columnas))
+            actual = previo[actual]
+        ruta.reverse()
+        return ruta
+
+    def tierra_luego_agua(self, celdas, tierra, con_agua, origen, destino, probar_tierra=True, crear_cola=deque):
+        """
+        Ruta por tierra y, si no hay, con agua, en una sola búsqueda. tierra y con_agua son
+        tablas como la de buscar. Devuelve (ruta, 'tierra'), (ruta, 'agua') o (None, None).
+
+        La fase 1 es el mismo BFS que buscar, sólo por tierra, y anota la orilla: las celdas
+        que se pisan con agua pero no por tierra y que tocan su región. Si no llega, la fase
+        2 sigue desde esa orilla con agua permitida y usa las distancias por tierra como
+        cotas: una celda ya visitada sólo se vuelve a expandir si el agua la acorta.
+        Con probar_tierra=False (o un extremo que no es tierra) empieza directo en la fase 2.
+        """
+        total = self.filas * self.columnas
+        # Ninguna distancia llega a total: marca = base + distancia cabe en el rango
+        base = self._nueva_generacion(total)
+        marca, previo, columnas = self.marca, self.previo, self.columnas
+        marca[origen] = base
+        previo[origen] = -1
+        orilla = []  # celdas de agua que tocan la región, en orden de distancia
+
+        por_tierra = probar_tierra and tierra[celdas[origen]] and tierra[celdas[destino]]
+        if por_tierra:
+            cola = crear_cola([origen])
+            sacar, encolar = cola.popleft, cola.append
+            anotar = orilla.append
+            # Toda celda que se toca queda marcada, sea tierra o no, así cada una se mira una sola vez
+            siguiente, restantes = base + 1, 1  # marca de la próxima capa y celdas que quedan de esta
+            while cola:
+                actual = sacar()
+                if actual == destino:
+                    return self._ruta(destino), 'tierra'
+                columna = actual % columnas
+                vecino = actual + columnas
+                if vecino < total and marca[vecino] < base:
+                    marca[vecino] = siguiente
+                    if tierra[celdas[vecino]]:
+                        previo[vecino] = actual
+                        encolar(vecino)
+                    elif con_agua[celdas[vecino]]:
+                        previo[vecino] = actual
+                        anotar(vecino)
+                vecino = actual - columnas
+                if vecino >= 0 and marca[vecino] < base:
+                    marca[vecino] = siguiente
+                    if tierra[celdas[vecino]]:
+                        previo[vecino] = actual
+                        encolar(vecino)
+                    elif con_agua[celdas[vecino]]:
+                        previo[vecino] = actual
+                        anotar(vecino)
+                if columna + 1 < columnas:
+                    vecino = actual + 1
+                    if marca[vecino] < base:
+                        marca[vecino] = siguiente
+                        if tierra[celdas[vecino]]:
+                            previo[vecino] = actual
+                            encolar(vecino)
+                        elif con_agua[celdas[vecino]]:
+                            previo[vecino] = actual
+                            anotar(vecino)
+                if columna:
+                    vecino = actual - 1
+                    if marca[vecino] < base:
+                        marca[vecino] = siguiente
+                        if tierra[celdas[vecino]]:
+                            previo[vecino] = actual
+                            encolar(vecino)
+                        elif con_agua[celdas[vecino]]:
+                            previo[vecino] = actual
+                            anotar(vecino)
+                restantes -= 1
+                if not restantes:
+                    siguiente, restantes = siguiente + 1, len(cola)
+
+        if not (con_agua[celdas[origen]] and con_agua[celdas[destino]]):
+            return None, None
+
+        # La orilla sale de la fase 1 en orden no decreciente de distancia, igual que la
+        # cola; mezclar ambas en orden mantiene el recorrido por distancia creciente.
+        if por_tierra:
+            semillas = crear_cola((marca[celda], celda) for celda in orilla)
+        else:
+            semillas = crear_cola([(base, origen)])
+
+        cola = crear_cola()
+        while cola or semillas:
+            if cola and (not semillas or cola[0][0] <= semillas[0][0]):
+                nivel, actual = cola.popleft()
+            else:
+                nivel, actual = semillas.popleft()
+            if nivel > marca[actual]:
+                continue  # la celda ya se mejoró después de encolarla
+            if actual == destino:
+                return self._ruta(destino), 'agua'
+            siguiente = nivel + 1
+            columna = actual % columnas
+            for vecino in (actual + columnas if actual + columnas < total else -1,
+                           actual - columnas,
+                           actual + 1 if columna + 1 < columnas else -1,
+                           actual - 1 if columna else -1):
+                if vecino < 0 or not con_agua[celdas[vecino]]:
+                    continue
+                if marca[vecino] < base or siguiente < marca[vecino]:
+                    marca[vecino] = siguiente
+                    previo[vecino] = actual
+                    cola.append((siguiente, vecino))
+        return None, None
+
+        # Las semillas salen de la fase 1 en orden no decreciente de distancia, igual que
+        # la cola; mezclar ambas en orden mantiene el recorrido por distancia creciente.
+        semillas = crear_cola()
+        if not por_tierra:
+            semillas.append((0, origen))
+        for d, celda, desde in orilla:
+            if marca[celda] != generacion:
+                marca[celda] = generacion
+                previo[celda] = desde
+                distancia[celda] = d
+                semillas.append((d, celda))
+
+        cola = crear_cola()
+        while cola or semillas:
+            if cola and (not semillas or cola[0][0] <= semillas[0][0]):
+                d, actual = cola.popleft()
+            else:
+                d, actual = semillas.popleft()
+            if d > distancia[actual]:
+                continue  # la celda ya se mejoró después de encolarla
+            if actual == destino:
+                return self._ruta(destino), 'agua'
+            siguiente = d + 1
+            columna = actual % columnas
+            for vecino in (actual + columnas if actual + columnas < total else -1,
+                           actual - columnas,
+                           actual + 1 if columna + 1 < columnas else -1,
+                           actual - 1 if columna else -1):
+                if vecino < 0 or not con_agua[celdas[vecino]]:
+                    continue
+                if marca[vecino] != generacion or siguiente < distancia[vecino]:
+                    marca[vecino] = generacion
+                    previo[vecino] = actual
+                    distancia[vecino] = siguiente
+                    cola.append((siguiente, vecino))
+        return None, None
+
+
+_ULTIMO = {}
+
+
+def nucleo_para(filas, columnas):
+    "Núcleo con búferes para ese tamaño; se reutiliza mientras el tamaño no cambie"
+
+    nucleo = _ULTIMO.get('nucleo')
+    if nucleo is None or (nucleo.filas, nucleo.columnas) != (filas, columnas):
+        nucleo = _ULTIMO['nucleo'] = NucleoBFS(filas, columnas)
+    return nucleo
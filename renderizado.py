@@ -0,0 +1,120 @@
+"""
+Dibujo de mapas en texto compartido por calculadora.py y calculadora2.py.
+
+Cada fila visible se convierte a símbolos de una sola vez con bytes.translate y una tabla
+valor de celda -> símbolo; después se superponen la ruta, el inicio y el destino. El
+cuadro completo se arma en memoria y se escribe con una sola llamada.
+
+La ventana limita lo que se procesa y se muestra:
+- None: todo el mapa.
+- (f0, c0, f1, c1): filas f0..f1-1 y columnas c0..c1-1 (se recorta al mapa).
+- 'ruta': el rectángulo que encierra ruta, inicio y destino, más MARGEN_VENTANA.
+- 'auto': todo el mapa si cabe en MAX_FILAS_VISIBLES x MAX_COLUMNAS_VISIBLES; si no,
+  la ventana de la ruta (o la esquina superior izquierda) recortada a ese tamaño.
+"""
+
+import sys
+
+CAMINO_LIBRE = 0
+EDIFICIO = 1
+AGUA = 2
+ZONA_BLOQUEADA = 3
+
+MARGEN_VENTANA = 3
+MAX_FILAS_VISIBLES = 60
+MAX_COLUMNAS_VISIBLES = 100
+
+
+def tabla_simbolos(modo_detallado=False):
+    # Valor de celda -> símbolo; los valores desconocidos se ven como '?'
+    tabla = bytearray(b'?' * 256)
+    tabla[CAMINO_LIBRE] = ord('.')
+    tabla[EDIFICIO] = ord('X')
+    tabla[AGUA] = ord('~') if modo_detallado else ord('X')
+    tabla[ZONA_BLOQUEADA] = ord('T') if modo_detallado else ord('X')
+    return bytes(tabla)
+
+
+_TABLAS = {False: tabla_simbolos(False), True: tabla_simbolos(True)}
+
+
+def calcular_ventana(ventana, filas, columnas, ruta=None, inicio=None, destino=None):
+    "Devuelve (f0, c0, f1, c1) ya recortada a los límites del mapa"
+
+    if ventana is None:
+        return 0, 0, filas, columnas
+
+    if ventana in ('ruta', 'auto'):
+        if ventana == 'auto' and filas <= MAX_FILAS_VISIBLES and columnas <= MAX_COLUMNAS_VISIBLES:
+            return 0, 0, filas, columnas
+        puntos = list(ruta or ()) + [p for p in (inicio, destino) if p is not None]
+        if puntos:
+            f0 = min(f for f, _ in puntos) - MARGEN_VENTANA
+            c0 = min(c for _, c in puntos) - MARGEN_VENTANA
+            f1 = max(f for f, _ in puntos) + MARGEN_VENTANA + 1
+            c1 = max(c for _, c in puntos) + MARGEN_VENTANA + 1
+        else:
+            f0, c0, f1, c1 = 0, 0, filas, columnas
+        if ventana == 'auto':
+            f1 = min(f1, max(f0, 0) + MAX_FILAS_VISIBLES)
+            c1 = min(c1, max(c0, 0) + MAX_COLUMNAS_VISIBLES)
+    else:
+        f0, c0, f1, c1 = ventana
+
+    f0, c0 = max(f0, 0), max(c0, 0)
+    f1, c1 = min(f1, filas), min(c1, columnas)
+    return f0, c0, max(f0, f1), max(c0, c1)
+
+
+def leer_ventana(argumentos):
+    "Interpreta los argumentos del comando 'ventana': completa, ruta, auto o f0 c0 f1 c1"
+
+    if len(argumentos) == 1 and argumentos[0] in ('ruta', 'auto'):
+        return argumentos[0]
+    if len(argumentos) == 1 and argumentos[0] == 'completa':
+        return None
+    if len(argumentos) == 4:
+        return tuple(int(valor) for valor in argumentos)
+    raise ValueError("Uso: ventana completa | ruta | auto | f0 c0 f1 c1")
+
+
+def dibujar(fila_de, filas, columnas, ruta=None, inicio=None, destino=None, modo_detallado=False, ventana=None):
+    """
+    Arma el cuadro como texto. fila_de(f, c0, c1) devuelve los valores de las columnas
+    c0..c1-1 de la fila f como bytes (o algo que bytes() acepte).
+    """
+
+    f0, c0, f1, c1 = calcular_ventana(ventana, filas, columnas, ruta, inicio, destino)
+    tabla = _TABLAS[bool(modo_detallado)]
+
+    # Marcas por fila, sólo las que caen dentro de la ventana. Se aplican en orden, así
+    # que el destino tapa la ruta y el inicio tapa a ambos.
+    marcas = {}
+    for simbolo, puntos in ((ord('*'), ruta or ()), (ord('D'), (destino,)), (ord('I'), (inicio,))):
+        for punto in puntos:
+            if punto is not None and f0 <= punto[0] < f1 and c0 <= punto[1] < c1:
+                marcas.setdefault(punto[0], []).append((punto[1] - c0, simbolo))
+
+    ancho = c1 - c0
+    lineas = []
+    if (f0, c0, f1, c1) != (0, 0, filas, columnas):
+        lineas.append(f"[filas {f0}-{f1 - 1}, columnas {c0}-{c1 - 1} de {filas}x{columnas}]")
+    for f in range(f0, f1):
+        simbolos = bytearray(bytes(fila_de(f, c0, c1)).translate(tabla))
+        for c, simbolo in marcas.get(f, ()):
+            simbolos[c] = simbolo
+        # Un espacio entre símbolos: se escriben en las posiciones pares
+        linea = bytearray(b' ' * (2 * ancho - 1)) if ancho else bytearray()
+        linea[::2] = simbolos
+        lineas.append(linea.decode('ascii'))
+    lineas.append('')
+    return '\n'.join(lineas) + '\n'
+
+
+def mostrar(fila_de, filas, columnas, ruta=None, inicio=None, destino=None, modo_detallado=False,
+            ventana=None, salida=None):
+    "Dibuja el mapa y lo escribe de una sola vez en salida (sys.stdout por defecto)"
+
+    salida = salida or sys.stdout
+    salida.write(dibujar(fila_de, filas, columnas, ruta, inicio, destino, modo_detallado, ventana))
+    salida.flush()